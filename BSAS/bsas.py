@@ -21,18 +21,144 @@ import matplotlib.pyplot as plt
 import numpy as np
 from PIL import Image
 
+os.chdir("../Utility")
+import mask_IO
 
 
+
+def run_length_BSAS(_mask, _threshold):
+    """
+    Vectorized equivalent of BSAS_Process.line_BSAS2 applied on every line of
+    _mask at once.
+    
+    On each line, a cluster starts on a white pixel and gathers the following
+    white pixels until _threshold black pixels (counted from the start of the
+    cluster) have been met. The clusters are therefore made of consecutive runs
+    of white pixels. The runs are found with np.diff on the whole mask and the
+    runs of a cluster are found by a np.searchsorted on the cumulated sum of
+    the gaps between the runs. All the lines are processed together, one
+    cluster per line at each iteration.
+    
+    Only the clusters of 3 white pixels or more are kept. Their centroid is the
+    ceiling of the mean of the column indices of their white pixels.
+    
+    Returns an integer array of shape (N, 2) of the [line, column] centroids
+    sorted by line and then by column.
+    """
+    white = np.asarray(_mask) == 255
+    nb_lines, nb_columns = white.shape
+    
+    if (_threshold <= 0):
+        return np.zeros((0, 2), dtype=np.int64)
+    
+    padded = np.zeros((nb_lines, nb_columns+2), dtype=np.int8)
+    padded[:, 1:-1] = white
+    edges = np.diff(padded, axis=1)
+    
+    #runs of white pixels: [run_start, run_stop[ on line run_line
+    run_line, run_start = np.nonzero(edges == 1)
+    run_stop = np.nonzero(edges == -1)[1]
+    nb_runs = run_line.size
+    if (nb_runs == 0):
+        return np.zeros((0, 2), dtype=np.int64)
+    
+    run_length = run_stop - run_start
+    run_sum = (run_start + run_stop - 1) * run_length // 2 #sum of the indices of the run
+    
+    #index of the last run of the line of every run
+    run_line_last = np.searchsorted(run_line, run_line, side='right') - 1
+    
+    #number of black pixels after every run, until the next run of the line
+    #or until the end of the line
+    is_line_last = run_line_last == np.arange(nb_runs)
+    run_gap = np.empty(nb_runs, dtype=np.int64)
+    run_gap[:-1] = run_start[1:] - run_stop[:-1]
+    run_gap[is_line_last] = nb_columns - run_stop[is_line_last]
+    
+    cumul_gap = np.cumsum(run_gap)
+    cumul_length = np.cumsum(run_length)
+    cumul_sum = np.cumsum(run_sum)
+    
+    clusters_first, clusters_last = [], []
+    current = np.flatnonzero(np.r_[True, run_line[1:] != run_line[:-1]])
+    while (current.size > 0):
+        #last run of the cluster: first run where _threshold black pixels have
+        #been met since the start of the cluster, or last run of the line
+        last = np.searchsorted(cumul_gap,
+                               cumul_gap[current] - run_gap[current] + _threshold,
+                               side='left')
+        last = np.minimum(last, run_line_last[current])
+        clusters_first.append(current)
+        clusters_last.append(last)
+        
+        current = last + 1
+        current = current[current <= run_line_last[last]]
+    
+    clusters_first = np.concatenate(clusters_first)
+    clusters_last = np.concatenate(clusters_last)
+    
+    nb_pixels = cumul_length[clusters_last] - cumul_length[clusters_first] + run_length[clusters_first]
+    sum_pixels = cumul_sum[clusters_last] - cumul_sum[clusters_first] + run_sum[clusters_first]
+    
+    kept = nb_pixels > 2
+    clusters_first = clusters_first[kept]
+    centroids = np.column_stack((run_line[clusters_first],
+                                 -((-sum_pixels[kept]) // nb_pixels[kept])))
+    
+    return centroids[np.lexsort((run_start[clusters_first], run_line[clusters_first]))]
+
+def run_length_BSAS_both_directions(_mask, _threshold):
+    """
+    Centroids of run_length_BSAS applied on the lines and on the columns of
+    _mask, as a single integer array of shape (N, 2) of [line, column]
+    coordinates. The centroids of the lines describe well the crops rows
+    closer to the vertical and the centroids of the columns the crops rows
+    closer to the horizontal.
+    """
+    return np.vstack((run_length_BSAS(_mask, _threshold),
+                      run_length_BSAS(np.transpose(_mask), _threshold)[:, ::-1]))
+
+def run_length_BSAS_by_blocks(_mask, _threshold, _direction = 0, _block_size = 256):
+    """
+    Same as run_length_BSAS on the lines (_direction = 0) or on the columns
+    (_direction = 1) of _mask, for a mask that is rendered by blocks of lines
+    or columns (see rotated_frame.Rotated_Mask.iter_blocks) instead of being
+    held in memory.
+    
+    Returns an integer array of shape (N, 2) of [line, column] centroids,
+    in the same order as BSAS_Process.img_BSAS.
+    """
+    centroids = [np.zeros((0, 2), dtype=np.int64)]
+    for _start, _block in _mask.iter_blocks(_direction, _block_size):
+        if (_direction == 0):
+            block_centroids = run_length_BSAS(_block, _threshold)
+        else:
+            block_centroids = run_length_BSAS(np.transpose(_block), _threshold)
+        block_centroids[:, 0] += _start
+        centroids.append(block_centroids)
+    
+    centroids = np.vstack(centroids)
+    if (_direction == 1):
+        centroids = centroids[:, ::-1]
+    return centroids
+
 class BSAS_Process:
 
-    def __init__(self, path_input_img, img_id, _path_output_txt):#_img_array,
+    def __init__(self, path_input_img, img_id, _path_output_txt, _img_array = None):
         """
             - img: segmented image (only a few pixel values)
             --> ex: image obtained through ExG or Otsu segmentation (using the latter is recommended)
+            
+            - _img_array: 2D 0/255 mask already in memory, or a
+            rotated_frame.Rotated_Mask. If given, it is used instead of
+            loading img_id from path_input_img.
         """
-                
-        self.img_array = self.get_img_array(os.path.join(path_input_img, img_id))
-        self.img_array = np.where(self.img_array > 200, 255, 0)
+        
+        if (_img_array is None):
+            #2D 0/255 mask (see mask_IO.load_mask)
+            self.img_array = mask_IO.load_mask(path_input_img, img_id)
+        else:
+            self.img_array = _img_array
         
         self.img_id = img_id
 
@@ -84,8 +210,7 @@ class BSAS_Process:
         line_centroids = []
 
         for j in range(np.shape(self.img_array)[1]):
-            #print(self.img_array[line_id,j][0])
-            if self.img_array[line_id,j][0]==255: #only white pixels are clustered
+            if self.img_array[line_id,j]==255: #only white pixels are clustered
                 #print("Add sample")
                 sample.append([line_id,j])
 
@@ -106,13 +231,13 @@ class BSAS_Process:
         pixel_index = 0
         while pixel_index < self.img_array.shape[1]:
             
-            if (self.img_array[line_id, pixel_index][0]==255):
+            if (self.img_array[line_id, pixel_index]==255):
                 new_clust = [pixel_index]
                 clust_pixel_index = pixel_index+1
                 nb_black_pixels = 0
                 nb_pixel_in_clust = 0
                 while clust_pixel_index < self.img_array.shape[1] and nb_black_pixels < self.threshold:
-                    if (self.img_array[line_id, clust_pixel_index][0]==255):
+                    if (self.img_array[line_id, clust_pixel_index]==255):
                         new_clust += [clust_pixel_index]
                         nb_pixel_in_clust += 1
                     else:
@@ -141,13 +266,13 @@ class BSAS_Process:
         pixel_index = 0
         while pixel_index < self.img_array.shape[0]:
             
-            if (self.img_array[pixel_index, col_id][0]==255):
+            if (self.img_array[pixel_index, col_id]==255):
                 new_clust = [pixel_index]
                 clust_pixel_index = pixel_index+1
                 nb_black_pixels = 0
                 nb_pixel_in_clust = 0
                 while clust_pixel_index < self.img_array.shape[0] and nb_black_pixels < self.threshold:
-                    if (self.img_array[clust_pixel_index, col_id][0]==255):
+                    if (self.img_array[clust_pixel_index, col_id]==255):
                         new_clust += [clust_pixel_index]
                         nb_pixel_in_clust += 1
                     else:
@@ -178,24 +303,23 @@ class BSAS_Process:
             (=1)
         """
 
-        img_centroids = []  #contains all the cluster centers found with the BSAS algorithm on the img
-        
         #print("Computing centroids for image:", self.img_id, end="... ")
-        if (self.direction == 0):
-            for i in range(np.shape(self.img_array)[0]):#for each line of pixels
-                #centroids found with self.line_BSAS are added to the global list
-                #print(self.line_BSAS(i))
-                #img_centroids.append(self.line_BSAS(i))
-                img_centroids.append(self.line_BSAS2(i))
+        #The centroids of all the lines (or columns) are computed at once by
+        #run_length_BSAS. It gives the same centroids as self.line_BSAS2 (or
+        #self.col_BSAS2) applied on every line (or column).
+        if (hasattr(self.img_array, "iter_blocks")):
+            #rotated frame of a mask: it is rendered block by block
+            centroids = run_length_BSAS_by_blocks(self.img_array, self.threshold,
+                                                  self.direction)
+        elif (self.direction == 0):
+            centroids = run_length_BSAS(self.img_array, self.threshold)
         elif(self.direction == 1):
-            for i in range(np.shape(self.img_array)[1]):#for each column of pixels
-                #centroids found with self.line_BSAS are added to the global list
-                #print(self.line_BSAS(i))
-                #img_centroids.append(self.line_BSAS(i))
-                img_centroids.append(self.col_BSAS2(i))
-            
-            
-        self.img_centroids = img_centroids
+            centroids = run_length_BSAS(np.transpose(self.img_array), self.threshold)[:, ::-1]
+        
+        #contains all the cluster centers found with the BSAS algorithm on the
+        #img, as an integer array of shape (N, 2) of [h, w] coordinates sorted
+        #by line (or by column)
+        self.img_centroids = np.ascontiguousarray(centroids)
         print("Done")
         #print(self.img_centroids)
 
@@ -210,15 +334,37 @@ class BSAS_Process:
         file = open(self.path_output_txt+"/"+str(name)+'_bsas.txt',"w")
         #a txt file named after the image is created
         file.write(str(np.shape(self.img_array)[0])+'*'+str(np.shape(self.img_array)[1])+'\n')
-        for k in range(np.shape(self.img_array)[self.direction]): #for each line
-            line_centroids = self.img_centroids[k]
-            for centroid in line_centroids:
-                [h, w] = centroid
-                file.write(str(int(h))+','+str(int(w))+'\n')
-                
+        np.savetxt(file, self.img_centroids, fmt="%d", delimiter=",")
+        
         #gIO.writer(self.path_output_txt, str(name)+'_bsas.txt', self.img_centroids, True, False)
         file.close()
 
+    def save_centroid_coordinates_npy(self):
+        """
+        Binary equivalent of save_centroid_coordinates. The centroids are saved
+        in a .npy file as an int32 array of shape (N+1, 2):
+            - the first row is the header and contains the shape of the image
+            (number of lines, number of columns)
+            - the following rows are the [h, w] coordinates of the centroids
+        The file can be memory-mapped when it is read (see
+        FrequencyAnalysis.get_bsas_file_content).
+        """
+        name = (self.img_id).split('.')[0]
+        centroids = np.empty((self.img_centroids.shape[0]+1, 2), dtype=np.int32)
+        centroids[0] = np.shape(self.img_array)[:2]
+        centroids[1:] = self.img_centroids
+        np.save(self.path_output_txt+"/"+str(name)+'_bsas.npy', centroids)
+
+    def get_centroids_content(self):
+        """
+        Returns the centroids in the same form as the content of a bsas file
+        read by FrequencyAnalysis.get_bsas_file_content: (lines, columns, X, Y).
+        It is used to give the centroids to the Fourier Analysis without
+        going through the files.
+        """
+        return (np.shape(self.img_array)[0], np.shape(self.img_array)[1],
+                self.img_centroids[:,1], self.img_centroids[:,0])
+
     def get_BSASmap(self):
         """
         This function generates the black&white image of the "row skeletons".
@@ -228,13 +374,10 @@ class BSAS_Process:
         #BSAS map is initialized as a black background, on which the centroids
         #will appear as white spots
 
-        BSAS_map = np.zeros_like(self.img_array, dtype = "uint8")
-
-        for k in range(np.shape(self.img_array)[self.direction]): #for each line
-            line_centroids = self.img_centroids[k]
-            for [h,w] in line_centroids:
-                BSAS_map[int(h),int(w)]=255 #the pixel is set to white
-                    
+        BSAS_map = np.zeros(np.shape(self.img_array)[:2], dtype = "uint8")
+        
+        #the pixels of the centroids are set to white
+        BSAS_map[self.img_centroids[:,0], self.img_centroids[:,1]] = 255
 
         self.BSAS_map = Image.fromarray(BSAS_map).convert('L')
 
@@ -245,9 +388,13 @@ class BSAS_Process:
     def save_BSASmap(self, output_path_img, output_format = 'JPEG'):
         if not hasattr(self, "BSAS_map"):
             self.get_BSASmap()
-        self.BSAS_map.save(output_path_img + "/" +self.img_id,output_format)
+        name = (self.img_id).split('.')[0]
+        self.BSAS_map.save(output_path_img + "/" + name + \
+                           mask_IO.MASK_EXTENSIONS.get(output_format, "."+output_format.lower()),
+                           output_format)
 
-    def full_process(self, _direction = 0, display = True, _rows_threshold = None):
+    def full_process(self, _direction = 0, display = True, _rows_threshold = None,
+                     _centroids_format = "TXT"):
         """
         This function manages the whole process of BSAS implementation and
         visualisation (optional, if display == True)
@@ -255,12 +402,19 @@ class BSAS_Process:
         _direction (int):
             controls whether BSAS will be applied horizontally (=0) or vertically
             (=1)
+        
+        _centroids_format (string):
+            "TXT" to save the centroids in a text file, "NPY" to save them in
+            a binary .npy file
         """
         self.direction = _direction
         
         self.set_BSAS_parameters(_rows_threshold)
         self.img_BSAS()
-        self.save_centroid_coordinates()
+        if (_centroids_format == "NPY"):
+            self.save_centroid_coordinates_npy()
+        else:
+            self.save_centroid_coordinates()
 
         if display:
             self.get_BSASmap()
@@ -268,6 +422,34 @@ class BSAS_Process:
             #the function save can be added here
 
 
+def BSAS_Both_Directions(path_input_img, img_id, _paths_output_txt,
+                         _rows_threshold = None, _img_array = None,
+                         _centroids_format = "TXT"):
+    """
+    Applies the BSAS in direction 0 and in direction 1 on the same mask. The
+    mask is loaded once (or taken from _img_array if it is already in memory)
+    and shared by the two BSAS_Process.
+    
+    _paths_output_txt (list of 2 strings):
+        directories where the centroids of the directions 0 and 1 are saved
+    
+    _centroids_format (string):
+        "TXT" or "NPY", see BSAS_Process.full_process
+    
+    Returns the list of the two BSAS_Process (direction 0 and direction 1)
+    """
+    if (_img_array is None):
+        _img_array = mask_IO.load_mask(path_input_img, img_id)
+    
+    BSAS_processes = []
+    for k in range (2):
+        bsp = BSAS_Process(path_input_img, img_id, _paths_output_txt[k], _img_array)
+        bsp.full_process(k, False, _rows_threshold, _centroids_format)
+        BSAS_processes.append(bsp)
+    
+    return BSAS_processes
+
+
 if __name__ == '__main__':
 
     path_input_img = 'C:/Users/court/Documents/APT/3A/projet_fil_rouge/images_segmentees/Otsu/DJI_0031_1x1.jpg'
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the angle detection engines of CRAD.
+
+goal:
+    - Compare the accuracy and the runtime of the different ways of looking
+    for the crops rows angle on a set of Otsu masks (for example the ones of
+    the Tutorial, computed by Process_image_for_FT.py)
+Method
+    - The reference is the original search: every white pixel of the mask and
+    every degree from 0 to 179 with the occupancy score.
+    - Every configuration is run on every mask. For each configuration we
+    report the mean runtime per image, the largest difference with the
+    reference angle, the number of images where this difference is above
+    1 degree and the angle voted for the whole set (see CRAD.Vote_Best_Angle).
+
+variables the user can change:
+    - path_Otsu (string): directory of the Otsu masks
+
+    - configurations (dict): name of the configuration: arguments given to
+    Run_Configuration
+"""
+
+import os
+import time
+import numpy as np
+
+import CRAD
+
+os.chdir("../Utility")
+import mask_IO
+
+
+def Angle_Difference(_angle1, _angle2):
+    """
+    Difference between two orientations in degrees, modulo 180 degrees
+    """
+    return abs((_angle1 - _angle2 + 90) % 180 - 90)
+
+def Run_Configuration(_AD, _engine = "occupancy", _angle_steps = (5, 1),
+                      _sampling = None, _sampling_size = None,
+                      _downsampling = 4):
+    """
+    Looks for the angle of _AD with the given engine and parameters (see
+    CRAD.CRAD.get_coord_map, CRAD.CRAD.get_projection_map and
+    CRAD.CRAD.auto_angle2). Returns the angle and the runtime.
+    """
+    t0 = time.perf_counter()
+    if (_engine == "projection"):
+        _AD.get_projection_map(_downsampling)
+    else:
+        _AD.get_coord_map(_sampling, _sampling_size)
+    _AD.auto_angle2(_angle_steps)
+
+    return _AD.angle_min, time.perf_counter() - t0
+
+def Benchmark_CRAD(_path_Otsu, _configurations):
+
+    images_id = [os.path.splitext(_name)[0][len("OTSU_"):]
+                 for _name in mask_IO.list_masks(_path_Otsu)
+                 if _name.startswith("OTSU_")]
+    nb_images = len(images_id)
+
+    angles = {_c: [] for _c in _configurations}
+    runtimes = {_c: [] for _c in _configurations}
+    reference_angles = []
+    reference_runtimes = []
+    for i in range (nb_images):
+        print("Image", images_id[i], "{0}/{1}".format(i+1, nb_images))
+        _AD = CRAD.CRAD(images_id[i], _path_Otsu, None, None, None)
+
+        angle, runtime = Run_Configuration(_AD, _angle_steps = (1,))
+        reference_angles.append(angle)
+        reference_runtimes.append(runtime)
+
+        for _c in _configurations:
+            angle, runtime = Run_Configuration(_AD, **_configurations[_c])
+            angles[_c].append(angle)
+            runtimes[_c].append(runtime)
+
+    print()
+    print("{0:<30}{1:>12}{2:>10}{3:>10}{4:>8}".format(
+            "configuration", "time/img (s)", "max diff", "nb > 1°", "vote"))
+    print("{0:<30}{1:>12.3f}{2:>10}{3:>10}{4:>8}".format(
+            "reference", np.mean(reference_runtimes), 0, 0,
+            CRAD.Vote_Best_Angle(reference_angles)[0]))
+    for _c in _configurations:
+        differences = [Angle_Difference(_a, _r) for _a, _r in zip(angles[_c], reference_angles)]
+        print("{0:<30}{1:>12.3f}{2:>10.1f}{3:>10}{4:>8}".format(
+                _c, np.mean(runtimes[_c]), np.max(differences),
+                np.sum(np.array(differences) > 1),
+                CRAD.Vote_Best_Angle(angles[_c])[0]))
+
+if (__name__ == "__main__"):
+
+    configurations = {
+        "occupancy (5, 1)": dict(),
+        "occupancy (5, 1, 0.1)": dict(_angle_steps = (5, 1, 0.1)),
+        "occupancy random 100000": dict(_sampling = "random", _sampling_size = 100000),
+        "occupancy grid 4": dict(_sampling = "grid", _sampling_size = 4),
+        "projection 4": dict(_engine = "projection", _downsampling = 4),
+        "projection 8": dict(_engine = "projection", _downsampling = 8),
+        "projection 8 (5, 1, 0.1)": dict(_engine = "projection", _downsampling = 8,
+                                         _angle_steps = (5, 1, 0.1)),
+        }
+
+    Benchmark_CRAD(_path_Otsu = "../Tutorial/Output_General/Set1/Output/Session_1/Otsu",
+                   _configurations = configurations)
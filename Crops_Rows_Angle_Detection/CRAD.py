@@ -10,10 +10,147 @@ rows angle.
 # =============================================================================
 # from sklearn.cluster import DBSCAN
 # =============================================================================
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 from PIL import Image #, ImageDraw
 
+os.chdir("../Utility")
+import mask_IO
+import rotated_frame
+
+
+def Vote_Best_Angle(_angles, _resolution = 1, _smoothing = 0):
+    """
+    Each angle of _angles votes for the bin of width _resolution degrees that
+    contains it (modulo 180 degrees). With _resolution = 1, an angle votes for
+    its integer part.
+    
+    _smoothing (number):
+        standard deviation in degrees of the gaussian kernel applied to the
+        histogram of the votes. The kernel wraps around 180 degrees. It lets
+        the votes of neighbouring bins add up when the angles of the images
+        are spread on both sides of a bin edge. 0 means no smoothing.
+    
+    Returns the best angle, the histogram of the votes and the smoothed
+    histogram. The best angle is the mean of the angles in the bin with the
+    most (smoothed) votes, the last bin in case of equality, or the center
+    of this bin if it holds no angle.
+    """
+    angles = np.mod(np.asarray(_angles, dtype = np.float64), 180)
+    nb_bins = int(round(180/_resolution))
+    #rounding before the floor keeps the angles lying on a bin edge (e.g.
+    #37.3/0.1 = 372.999...) in the bin they start
+    bins = np.floor(np.round(angles/_resolution, 6)).astype(np.int64)
+    bins = np.minimum(bins, nb_bins - 1)
+    votes = np.bincount(bins, minlength = nb_bins)
+    
+    smoothed_votes = votes.astype(np.float64)
+    if (_smoothing > 0):
+        half_width = int(np.ceil(3*_smoothing/_resolution))
+        offsets = np.arange(-half_width, half_width + 1)
+        kernel = np.exp(-0.5*(offsets*_resolution/_smoothing)**2)
+        smoothed_votes = np.zeros(nb_bins)
+        for _o, _k in zip(offsets, kernel):
+            smoothed_votes += _k*np.roll(votes, _o)
+    
+    #the last bin with the most votes wins, as the largest angle won a tie
+    #of the integer vote
+    best_bin = nb_bins - 1 - np.argmax(smoothed_votes[::-1])
+    in_best_bin = angles[bins == best_bin]
+    if (in_best_bin.size > 0):
+        best_angle = round(float(np.mean(in_best_bin)), 6)
+    else:
+        best_angle = round((best_bin + 0.5)*_resolution, 6)
+    if (best_angle == int(best_angle)):
+        best_angle = int(best_angle)
+    
+    return best_angle, votes, smoothed_votes
+
+def Occupancy_Scores(_coord_map, _angles, _max_chunk_elements = 2**16):
+    """
+    Scores of the orientations _angles (in degrees) of the cloud of points
+    _coord_map (array of shape (N, 2) of x, y coordinates).
+    
+    For each angle, the points are rotated and projected on the X axis. The
+    score is the proportion of the columns (X rounded up) between the minimum
+    and the maximum of the projection that contain at least one point.
+    
+    The projections of K angles are computed by a single (2, K).T@(2, N)
+    matrix product (one line per angle) and the occupied columns are counted
+    on a boolean occupancy array instead of sorting the projections. The
+    angles are processed by chunks so that the product has about
+    _max_chunk_elements elements: larger chunks do not fit in the processor
+    cache and are slower.
+    
+    Returns the array of the scores of the angles.
+    """
+    coord_map_T = np.ascontiguousarray(np.transpose(_coord_map), dtype=np.float64)
+    theta = np.radians(np.asarray(_angles, dtype=np.float64).reshape(-1))
+    scores = np.empty(theta.size)
+    
+    chunk_size = max(1, _max_chunk_elements//max(coord_map_T.shape[1], 1))
+    for k in range (0, theta.size, chunk_size):
+        _theta = theta[k:k+chunk_size]
+        #first column of the rotation of the points by every angle (see
+        #CRAD.rotation_matrix)
+        X_rot_ceil = np.dot(np.array([np.cos(_theta), np.sin(_theta)]).T, coord_map_T)
+        np.ceil(X_rot_ceil, out=X_rot_ceil)
+        
+        X_min = np.min(X_rot_ceil, axis=1)
+        nb_columns = (np.max(X_rot_ceil, axis=1) - X_min + 1).astype(np.int64)
+        #the occupancy arrays of all the angles are concatenated
+        offsets = np.cumsum(nb_columns) - nb_columns
+        X_rot_ceil -= (X_min - offsets)[:, np.newaxis]
+        occupancy = np.zeros(np.sum(nb_columns), dtype=bool)
+        occupancy[X_rot_ceil.astype(np.intp)] = True
+        
+        scores[k:k+chunk_size] = np.add.reduceat(occupancy, offsets, dtype=np.int64)/nb_columns
+    
+    return scores
+
+def Projection_Scores(_coord_map, _weights, _angles, _max_chunk_elements = 2**16):
+    """
+    Projection (Radon transform like) scores of the orientations _angles (in
+    degrees) of the cloud of points _coord_map (array of shape (N, 2) of x, y
+    coordinates) weighted by _weights.
+    
+    For each angle, the points are rotated and their weights are summed in
+    the columns (X rounded up) of the projection on the X axis, which gives
+    the profile p. The score is (sum p)²/(span*sum p²) where span is the number
+    of columns between the minimum and the maximum of the projection. It is 1
+    for a flat profile and decreases when the weights are concentrated in a
+    few columns: it is minimal when the crops rows are vertical.
+    
+    The angles are processed by chunks as in Occupancy_Scores.
+    
+    Returns the array of the scores of the angles.
+    """
+    coord_map_T = np.ascontiguousarray(np.transpose(_coord_map), dtype=np.float64)
+    weights = np.asarray(_weights, dtype=np.float64)
+    theta = np.radians(np.asarray(_angles, dtype=np.float64).reshape(-1))
+    scores = np.empty(theta.size)
+    
+    chunk_size = max(1, _max_chunk_elements//max(coord_map_T.shape[1], 1))
+    for k in range (0, theta.size, chunk_size):
+        _theta = theta[k:k+chunk_size]
+        X_rot_ceil = np.dot(np.array([np.cos(_theta), np.sin(_theta)]).T, coord_map_T)
+        np.ceil(X_rot_ceil, out=X_rot_ceil)
+        
+        X_min = np.min(X_rot_ceil, axis=1)
+        nb_columns = (np.max(X_rot_ceil, axis=1) - X_min + 1).astype(np.int64)
+        #the profiles of all the angles are concatenated
+        offsets = np.cumsum(nb_columns) - nb_columns
+        X_rot_ceil -= (X_min - offsets)[:, np.newaxis]
+        profiles = np.bincount(X_rot_ceil.astype(np.intp).ravel(),
+                               np.tile(weights, _theta.size),
+                               minlength=np.sum(nb_columns))
+        
+        sum_p = np.add.reduceat(profiles, offsets)
+        sum_p2 = np.add.reduceat(profiles*profiles, offsets)
+        scores[k:k+chunk_size] = sum_p*sum_p/(nb_columns*sum_p2)
+    
+    return scores
 
 class CRAD_Voting:
     """
@@ -27,36 +164,32 @@ class CRAD_Voting:
     which do not match.
     
     """
-    def __init__(self, _AD_objects_list):
+    def __init__(self, _AD_objects_list, _resolution = 1, _smoothing = 0):
+        """
+        _resolution, _smoothing: width of the bins and standard deviation of
+        the smoothing kernel of the vote, in degrees (see Vote_Best_Angle)
+        """
         self.AD_objects_List = _AD_objects_list
+        self.resolution = _resolution
+        self.smoothing = _smoothing
     
     def Get_Best_Angle(self):
         print("Getting best angle")
-        self.dict_angles = {}
-        for _AD in self.AD_objects_List:
-            try:
-                self.dict_angles[int(_AD.angle_min)] += 1
-            except KeyError:
-                self.dict_angles[int(_AD.angle_min)] = 1
-        self.angles_sort = []
-        for k,v in self.dict_angles.items():
-            self.angles_sort.append([v,k])
-        self.angles_sort.sort()
-        
-        self.best_angle_min = self.angles_sort[-1][1]
+        self.best_angle_min, self.votes, self.smoothed_votes = Vote_Best_Angle(
+                [_AD.angle_min for _AD in self.AD_objects_List],
+                self.resolution, self.smoothing)
     
     def Correct_AD_based_on_best_angle(self):
+        """
+        Sets the angle of every AD object to the best angle. The rotated
+        coordinates of the objects are only computed again if they are used
+        (see CRAD.coord_centroid_map_Rot).
+        """
         print("Correcting LDs based on best angle")
         for _AD in self.AD_objects_List:
             if (_AD.angle_min != self.best_angle_min):
-                
-                _AD.angle_min = self.best_angle_min
-                
-                _AD.angle_min_rotation_matrix = _AD.rotation_matrix(np.deg2rad(_AD.angle_min))
-        
-                _AD.coord_centroid_map_Rot = np.dot(_AD.coord_map,
-                                                     _AD.angle_min_rotation_matrix)
-                
+                _AD.set_angle_min(self.best_angle_min)
+
 
 class CRAD:
 
@@ -74,60 +207,232 @@ class CRAD:
         self.img_id = img_id
         
         self.path_Otsu = _path_Otsu
-        self.Otsu_img = Image.open(_path_Otsu+"/OTSU_"+self.img_id+".jpg")
-        self.Otsu_img_arr = np.array(Image.open(_path_Otsu+"/OTSU_"+self.img_id+".jpg"))
+        #2D 0/255 mask (see mask_IO.load_mask)
+        self.Otsu_img_arr = mask_IO.load_mask(_path_Otsu, "OTSU_"+self.img_id)
         
         self.path_Otsu_R = _path_Otsu_R
         
         self.path_output_angle_score_search = _path_output_angle_score_search
         self.path_output_histogram = _path_output_histogram
     
-    def get_coord_map(self):
-        #self.Otsu_img_arr[:,:,0] correspond to the Red canal of the image 
-        #but the Otsu image is in black and white so it does not make any
-        #diferrence with the other canals.
-        #Although, for some reasons, the saved image does not have either black
-        #pixels [0 0 0] or white pixels [255 255 255]. Maybe because of the .jpg
-        #format?
-        #Anyway, we go through the whole thing and change the value to 0 or 255
-        #depending on the threshold placed at 200
+    def get_coord_map(self, _sampling = None, _sampling_size = None,
+                      _seed = 0, _centroids = None):
+        """
+        Builds self.coord_map, the (x, y) coordinates of the cloud of points
+        used to look for the angle of the crops rows.
+        
+        _sampling (string or None):
+            - None: every white pixel of the Otsu mask
+            - "random": _sampling_size (default 100000) white pixels drawn at
+            random
+            - "grid": stratified sampling. The mask is divided in cells of
+            _sampling_size x _sampling_size pixels (default 4) and one white
+            pixel is drawn at random in each cell that contains white pixels
+            - "BSAS": the BSAS centroids given in _centroids (array of
+            [line, column] coordinates, see bsas.run_length_BSAS_both_directions)
         
-        real_BW_Otsu = np.where(self.Otsu_img_arr > 200, 255, 0)
+        _seed (int):
+            seed of the random draws, so that the sampling is reproducible
+        """
+        #every point has the same weight (see get_projection_map)
+        self.coord_weights = None
+        
+        if (_sampling == "BSAS"):
+            self.coord_map = np.fliplr(np.asarray(_centroids))
+            return
+        
+        #self.Otsu_img_arr is already a binary 0/255 mask: the masks are stored
+        #losslessly, and the legacy .jpg masks are re-thresholded at 200 when
+        #they are loaded (see mask_IO.load_mask)
+        self.coord_map = np.fliplr(np.transpose(np.nonzero(self.Otsu_img_arr)))
         
-        self.coord_map = np.fliplr(np.transpose(np.nonzero(real_BW_Otsu[:,:,0])))
+        if (_sampling == "random"):
+            if (_sampling_size == None):
+                _sampling_size = 100000
+            if (_sampling_size < self.coord_map.shape[0]):
+                rng = np.random.default_rng(_seed)
+                kept = np.sort(rng.choice(self.coord_map.shape[0],
+                                          _sampling_size, replace=False))
+                self.coord_map = self.coord_map[kept]
+        
+        elif (_sampling == "grid"):
+            if (_sampling_size == None):
+                _sampling_size = 4
+            nb_cells_x = self.Otsu_img_arr.shape[1]//_sampling_size + 1
+            cells = (self.coord_map[:,1]//_sampling_size)*nb_cells_x + \
+                    self.coord_map[:,0]//_sampling_size
+            #the first pixel of each cell in a random order of the pixels
+            rng = np.random.default_rng(_seed)
+            order = rng.permutation(self.coord_map.shape[0])
+            kept = np.sort(order[np.unique(cells[order], return_index=True)[1]])
+            self.coord_map = self.coord_map[kept]
+    
+    def get_projection_map(self, _downsampling = 4):
+        """
+        Builds the cloud of points of the "projection" engine of auto_angle2:
+        the Otsu mask is downsampled by summing the white pixels in cells of
+        _downsampling x _downsampling pixels. self.coord_map holds the (x, y)
+        coordinates, in cell units, of the cells containing white pixels and
+        self.coord_weights their number of white pixels.
+        """
+        lines, columns = self.Otsu_img_arr.shape
+        #the mask is padded with black pixels to be a whole number of cells
+        padded = np.zeros((-(-lines//_downsampling)*_downsampling,
+                           -(-columns//_downsampling)*_downsampling), dtype=np.int32)
+        padded[:lines, :columns] = np.asarray(self.Otsu_img_arr) > 0
+        cells = np.sum(padded.reshape(padded.shape[0]//_downsampling, _downsampling,
+                                      padded.shape[1]//_downsampling, _downsampling),
+                       axis=(1, 3))
+        
+        cells_lines, cells_columns = np.nonzero(cells)
+        self.coord_map = np.column_stack((cells_columns, cells_lines))
+        self.coord_weights = cells[cells_lines, cells_columns]
     
     def display_centroid_map(self):
         plt.clf()
         plt.imshow(self.centroid_map)
     
-    def auto_angle2(self):
+    def angle_score(self, _angle):
+        """
+        Score of the orientation _angle (in degrees): the points of
+        self.coord_map are rotated by _angle and projected on the X axis. The
+        score is the proportion of the columns of the projection that contain
+        at least one point. It is minimal when the crops rows are vertical.
+        For a cloud of points built by get_projection_map, the score is the
+        one of Projection_Scores.
+        """
+        if (self.coord_weights is None):
+            return Occupancy_Scores(self.coord_map, [_angle])[0]
+        return Projection_Scores(self.coord_map, self.coord_weights, [_angle])[0]
+    
+    def angles_scores(self, _angles):
+        """
+        Computes the scores of the angles of _angles that have not been
+        evaluated yet and records them in self.auto_angle_scores. The new
+        angles are scored together by Occupancy_Scores, or by
+        Projection_Scores for a cloud of points built by get_projection_map.
+        """
+        new_angles = []
+        for _a in _angles:
+            #the orientations are equivalent modulo 180 degrees
+            _a = round(float(_a) % 180, 6)
+            if (_a.is_integer()):
+                _a = int(_a)
+            if (not _a in self.auto_angle_scores and not _a in new_angles):
+                new_angles.append(_a)
+        
+        if (len(new_angles) > 0):
+            if (self.coord_weights is None):
+                scores = Occupancy_Scores(self.coord_map, new_angles)
+            else:
+                scores = Projection_Scores(self.coord_map, self.coord_weights, new_angles)
+            for _a, _s in zip(new_angles, scores):
+                self.auto_angle_scores[_a] = _s
+    
+    def refine_angles(self, _angle_steps, _nb_candidates):
+        """
+        For each step of _angle_steps[1:], evaluates the angles around the
+        _nb_candidates best angles found so far with this step, on a window of
+        plus or minus the previous step.
+        """
+        for k in range (1, len(_angle_steps)):
+            #the window around a candidate is ]c-previous step, c+previous step[
+            nb_steps = int(round(_angle_steps[k-1]/_angle_steps[k])) - 1
+            window = _angle_steps[k]*np.arange(-nb_steps, nb_steps+1)
+            
+            candidates = sorted(self.auto_angle_scores,
+                                key = self.auto_angle_scores.get)[:_nb_candidates]
+            for _c in candidates:
+                self.angles_scores(_c + window)
+    
+    def get_best_evaluated_angle(self):
+        """
+        Returns the evaluated angle with the minimum score. In case of equal
+        scores, the smallest angle is kept.
+        """
+        angles = sorted(self.auto_angle_scores)
+        return angles[np.argmin([self.auto_angle_scores[_a] for _a in angles])]
+    
+    def auto_angle2(self, _angle_steps = (5, 1), _nb_candidates = 3,
+                    _search_window = None):
         """
         Aims to detect the orientation of the crops rows
+        
+        The search is done from coarse to fine: the angles from 0 to 180 degrees
+        are evaluated with the step _angle_steps[0]. Then, for each following
+        step, the angles around the _nb_candidates best angles found so far are
+        evaluated with this step, on a window of plus or minus the previous step.
+        
+        _angle_steps (tuple of numbers):
+            successive steps of the search, in degrees. (5, 1) evaluates about
+            60 angles instead of the 180 of a full search with a step of 1
+            degree. (5, 1, 0.1) adds a sub-degree refinement. (1,) is the
+            full search.
+        
+        _nb_candidates (int, min = 1):
+            number of angles around which the search is refined at each step.
+            The valley of the score around the angle of the crops rows can be
+            narrower than the coarse step: refining around several candidates
+            prevents from missing it.
+        
+        _search_window (tuple or None):
+            (center, half width) in degrees. If given, the search starts with
+            the angles from center-half width to center+half width instead of
+            0 to 180 degrees, with the steps _angle_steps[1:] (or _angle_steps
+            if there is a single step). If the best of these angles is on the
+            edge of the window, the minimum of the score is probably outside
+            of it: the full search is done instead and
+            self.angle_search_fallback is set to True.
+        
+        All the evaluated angles and their scores are kept in
+        self.auto_angle_score_angles and self.auto_angle_score_plot (sorted by
+        angle) for self.plot_auto_angle_score.
         """
         print("looking for the angle")
-        self.angle_min = 0
-        score_min = 1
-                
-        self.auto_angle_score_plot = []
-        angles = np.arange(0,180,1)
-        for _a in angles:
-            theta = np.radians(_a)
-            XY_rot = np.dot(self.coord_map, self.rotation_matrix(theta))
-            
-            X_rot_ceil = np.ceil(XY_rot[:,0])
-            X_rot_ceil_unique = np.unique(X_rot_ceil)
-            
-            score = np.shape(X_rot_ceil_unique)[0]/abs(np.max(X_rot_ceil)-np.min(X_rot_ceil)+1)
-            self.auto_angle_score_plot += [score]
+        self.auto_angle_scores = {}
+        self.angle_search_fallback = False
+        
+        if (_search_window != None):
+            (center, half_width) = _search_window
+            window_steps = _angle_steps
+            if (len(_angle_steps) > 1):
+                window_steps = _angle_steps[1:]
+            nb_steps = max(1, int(round(half_width/window_steps[0])))
+            self.angles_scores(center + window_steps[0]*np.arange(-nb_steps, nb_steps+1))
             
-            if (score < score_min):
-                score_min = score
-                self.angle_min = _a
+            #offset of the best angle to the center, modulo 180 degrees
+            offset = (self.get_best_evaluated_angle() - center + 90) % 180 - 90
+            if (abs(offset) >= (nb_steps - 0.5)*window_steps[0]):
+                print("The best angle is on the edge of the search window, full search")
+                self.auto_angle2(_angle_steps, _nb_candidates)
+                self.angle_search_fallback = True
+                return
+            self.refine_angles(window_steps, _nb_candidates)
+        else:
+            self.angles_scores(np.arange(0, 180, _angle_steps[0]))
+            self.refine_angles(_angle_steps, _nb_candidates)
         
-        self.angle_min_rotation_matrix = self.rotation_matrix(np.deg2rad(self.angle_min))
+        self.auto_angle_score_angles = np.array(sorted(self.auto_angle_scores))
+        self.auto_angle_score_plot = [self.auto_angle_scores[_a] for _a in self.auto_angle_score_angles]
         
-        self.coord_centroid_map_Rot = np.dot(self.coord_map,
-                                             self.angle_min_rotation_matrix)
+        self.set_angle_min(self.get_best_evaluated_angle())
+    
+    def set_angle_min(self, _angle):
+        """
+        Sets the angle of the crops rows and its rotation matrix. The rotated
+        cloud of points self.coord_centroid_map_Rot is computed when it is read.
+        """
+        self.angle_min = _angle
+        self.angle_min_rotation_matrix = self.rotation_matrix(np.deg2rad(self.angle_min))
+        if hasattr(self, "_coord_centroid_map_Rot"):
+            del self._coord_centroid_map_Rot
+    
+    @property
+    def coord_centroid_map_Rot(self):
+        if not hasattr(self, "_coord_centroid_map_Rot"):
+            self._coord_centroid_map_Rot = np.dot(self.coord_map,
+                                                  self.angle_min_rotation_matrix)
+        return self._coord_centroid_map_Rot
     
     def rotation_matrix(self, _theta):
         """
@@ -136,12 +441,47 @@ class CRAD:
         return np.array([[np.cos(_theta), -np.sin(_theta)],
                          [np.sin(_theta),  np.cos(_theta)]])
     
-    def get_auto_angle_rotated_Otsu(self):
-        self.Otsu_img_rot = self.Otsu_img.rotate(self.angle_min, expand=True)
-        self.Otsu_img_rot.save(self.path_Otsu_R+ "/OTSU_R_"+self.img_id+".jpg", "JPEG")
+    def get_auto_angle_rotated_Otsu(self, _mask_format = "NPY", _save_preview = False):
+        """
+        Rotates the Otsu mask by self.angle_min and saves it in self.path_Otsu_R.
+        The rotated mask is kept in self.Otsu_img_rot_arr for the next steps.
+        
+        _mask_format (string):
+            format of the saved mask ("NPY", "PNG" or "JPEG", see mask_IO).
+            With "ROT", the rotated mask is not rendered: self.Otsu_img_rot_arr
+            is a rotated_frame.Rotated_Mask reading the pixels of the Otsu
+            mask through the rotation, and only the angle and the path of the
+            Otsu mask are saved (see mask_IO.save_rotated_mask). In this case
+            self.Otsu_img_rot and self.Otsu_img_arr_rot are not computed.
+        
+        _save_preview (bool):
+            If True, a JPEG copy of the rotated mask is also saved
+        """
+        if (_mask_format == "ROT"):
+            self.Otsu_img_rot_arr = rotated_frame.Rotated_Mask(self.Otsu_img_arr,
+                                                               self.angle_min)
+            mask_IO.save_rotated_mask(self.path_Otsu_R, "OTSU_R_"+self.img_id,
+                                      mask_IO.find_mask_file(self.path_Otsu, "OTSU_"+self.img_id),
+                                      self.angle_min)
+            if (_save_preview):
+                mask_IO.save_mask(self.path_Otsu_R, "OTSU_R_"+self.img_id,
+                                  np.asarray(self.Otsu_img_rot_arr), "JPEG")
+            return
+        
+        #the PIL image of the mask is only built here, so that the "ROT" mode
+        #never reads the whole (possibly memory-mapped) mask.
+        #the default resampling filter of the rotation is NEAREST so the
+        #rotated mask stays binary
+        Otsu_img = Image.fromarray(np.asarray(self.Otsu_img_arr))
+        self.Otsu_img_rot = Otsu_img.rotate(self.angle_min, expand=True)
+        self.Otsu_img_rot_arr = np.array(self.Otsu_img_rot)
+        mask_IO.save_mask(self.path_Otsu_R, "OTSU_R_"+self.img_id,
+                          self.Otsu_img_rot_arr, _mask_format)
+        if (_save_preview and _mask_format != "JPEG"):
+            mask_IO.save_mask(self.path_Otsu_R, "OTSU_R_"+self.img_id,
+                              self.Otsu_img_rot_arr, "JPEG")
         
-        real_BW_Otsu_rot = np.where(np.array(self.Otsu_img_rot) > 200, 255, 0)
-        self.Otsu_img_arr_rot = np.fliplr(np.transpose(np.nonzero(real_BW_Otsu_rot[:,:,0])))
+        self.Otsu_img_arr_rot = np.fliplr(np.transpose(np.nonzero(self.Otsu_img_rot_arr)))
         
     def plot_auto_angle_rotation(self, _save = False):
         """
@@ -170,8 +510,7 @@ class CRAD:
         You must have computed self.angle_min with the self.auto_angle2() method.
         """
         plt.figure()
-        angles = np.arange(0,180,1)
-        plt.plot(angles, self.auto_angle_score_plot)
+        plt.plot(self.auto_angle_score_angles, self.auto_angle_score_plot, marker=".")
         if (_save):
             plt.savefig(self.path_output_angle_score_search+"/"+"AngleScore_"+\
                         self.img_id+".jpg")
@@ -23,11 +23,37 @@ variables the user can change:
     the Fourier Analysis.
     
     - bins_div_Y (int, min = 1): same as "bins_div_X" but on the Y axis
+    
+    - padding_factor (int, min = 1): the histograms are padded with zeros to
+    padding_factor times their length before the FFT, to interpolate the
+    frequency of the signal (see periodicity.py). 1 means no padding.
+    
+    - window (string or None): window function applied to the histograms
+    before the FFT ("hann", "hamming" or "blackman"). None means no window.
+    
+    - nb_workers (int or None, min = 1): number of processes analysing the
+    images in parallel. With 1 (default) the images are analysed one after
+    the other. With None, one process per CPU core is used.
+    
+    - fft_workers (int or None): number of threads of every FFT when scipy is
+    installed (see periodicity.py). None uses one thread, which is best when
+    nb_workers already uses all the CPU cores.
+    
+    - interpolation (string or None): "parabolic" (default) or "gaussian" to
+    locate the peaks of the spectrum and of the histograms between two bins,
+    by fitting a parabola (or a gaussian) on the bin of the peak and its two
+    neighbours. The predicted positions saved in the json files are then
+    floats instead of multiples of the size of the bins. None keeps the
+    integer positions.
 """
 import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 #import matplotlib.pyplot as plt
 
+import periodicity
+
 os.chdir("../Utility")
 import general_IO as gIO
 
@@ -46,11 +72,63 @@ def get_file_lines(path_csv_file):
     file_object.close()
     return(file_content)
 
+def Imap_Workers(_worker, _args_iterable, _nb_workers=1, _batch_size=None):
+    """
+    Lazy version of Process_image_for_FT.Map_Workers: yields the result of
+    _worker on every tuple of arguments of _args_iterable, in the same order.
+    If _nb_workers is not 1, the calls are distributed on a pool of
+    _nb_workers processes by batches of _batch_size calls (default 4 per
+    process), so that only one batch of arguments and results is held in
+    memory at a time.
+    """
+    if (_nb_workers == 1):
+        for _args in _args_iterable:
+            yield _worker(*_args)
+        return
+    
+    if (_batch_size == None):
+        _batch_size = 4*(_nb_workers or os.cpu_count())
+    
+    args_iterator = iter(_args_iterable)
+    with ProcessPoolExecutor(max_workers=_nb_workers) as executor:
+        batch = list(itertools.islice(args_iterator, _batch_size))
+        while (len(batch) > 0):
+            futures = [executor.submit(_worker, *_args) for _args in batch]
+            for _f in futures:
+                yield _f.result()
+            batch = list(itertools.islice(args_iterator, _batch_size))
+
 
 # =============================================================================
 # Specific Function Definition
 # =============================================================================
 
+def List_BSAS_Files(_path_bsas_dir0, _path_bsas_dir1):
+    """
+    Pairs the bsas files of the directions 0 and 1 by image id (the name of
+    the file without the "_bsas" suffix). If an image has both a binary and
+    a text file, the binary one is used. The images missing in one of the
+    directions are skipped.
+    
+    Returns the list of (image id, path of the file of the direction 0, path
+    of the file of the direction 1), sorted by image id
+    """
+    bsas_files = []
+    for _path in (_path_bsas_dir0, _path_bsas_dir1):
+        files = {}
+        for _name in sorted(os.listdir(_path)):
+            _id, _ext = os.path.splitext(_name)
+            if (_id.endswith("_bsas") and _ext in (".npy", ".txt")):
+                if (not _id[:-len("_bsas")] in files or _ext == ".npy"):
+                    files[_id[:-len("_bsas")]] = _path+"/"+_name
+        bsas_files.append(files)
+    
+    images_id = sorted(set(bsas_files[0]) & set(bsas_files[1]))
+    for _id in sorted(set(bsas_files[0]) ^ set(bsas_files[1])):
+        print("No bsas file in both directions for", _id, ": image skipped")
+    
+    return [(_id, bsas_files[0][_id], bsas_files[1][_id]) for _id in images_id]
+
 def separate_X_Y_from_bsas_files(_data):
     X, Y = [], []
     for _coord in _data[1:]:
@@ -59,156 +137,411 @@ def separate_X_Y_from_bsas_files(_data):
         Y += [float(y)]
     return np.array(X), np.array(Y)
 
-def Compute_Power_and_Freq(_signal):    
-    fourier = np.fft.fft(_signal)
-    power = np.absolute(fourier/_signal.size)**2
-    freq = np.fft.fftfreq(_signal.size, d=1)
+def get_bsas_file_content(_path_bsas_file):
+    """
+    Reads a bsas file, either in the text format (*_bsas.txt) or in the binary
+    format (*_bsas.npy). The binary files are memory-mapped: X and Y are then
+    read-only views on the columns of the file.
     
-    return power, freq
-
-def Get_Signal_Freq(_power, _all_freq):
-    nb_points = _all_freq.size
-    i=0
-    _max=0
-    _freq_index=0
-    while _all_freq[i] >= 0 and i < nb_points-1:
-        
-        if (_power[i+1] > _power[i]):
-            if (_power[i+1] > _max):
-                _max = _power[i+1]
-                _freq_index = i+1
-        i+=1
-    if (_freq_index == 0):
-        _freq_index += 1
-        
-    elif(_all_freq[_freq_index] < 0):
-        _freq_index=1
+    Returns (lines, columns, X, Y)
+    """
+    if (_path_bsas_file.endswith(".npy")):
+        data = np.load(_path_bsas_file, mmap_mode='r')
+        (lines, columns) = (int(data[0,0]), int(data[0,1]))
+        #y is first because coordinates in bsas files are (line, column)
+        return lines, columns, data[1:,1], data[1:,0]
     
-    return _all_freq[_freq_index]
-
-def Clamp_Value(_value, _min, _max):
-    if (_value < _min):
-        _value = _min
-    elif (_value > _max):
-        _value = _max
-    return _value
+    data = get_file_lines(_path_bsas_file)
+    size_str = data[0].split('*')
+    (lines, columns) = (int(size_str[0]), int(size_str[1]))
+    X, Y = separate_X_Y_from_bsas_files(data)
+    return lines, columns, X, Y
 
-def Get_Corrected_Peak_Index(_histogram, _peak_index, _search_window_half_width):
-    subset_low_boundary = Clamp_Value(_peak_index-_search_window_half_width,
-                                      0,
-                                      _histogram.size-1)
-    subset_high_boundary = Clamp_Value(_peak_index+_search_window_half_width+1,
-                                       0,
-                                       _histogram.size-1)
-    subset = _histogram[subset_low_boundary:subset_high_boundary]
-    return np.argsort(subset)[-1] - _search_window_half_width
-
-def Search_Periodic_Peaks(_histogram, _period, _bin_div):
+def Search_Periodic_Peaks_Batch(_histograms, _period, _bin_div,
+                                _interpolation=None):
+    """
+    Looks for the peaks of every histogram (line) of _histograms, spaced by
+    about _period bins (one period for all the histograms or one per
+    histogram).
     
-    signal_max_index = np.argsort(_histogram)[-1]
+    The search starts at the global maximum of the histogram, the last one
+    in case of equality, and steps one period at a time towards the
+    beginning and then towards the end. At each
+    step the peak is moved to the maximum of the histogram in a window of
+    half width 10% of the period (at least 1 bin) around the expected
+    position, the last one in case of equality, and is kept if the histogram
+    is not 0 there. The next expected position is one period away from the
+    corrected peak, and always at least one bin further.
     
-    search_window_half_width = int(0.1*_period)
-    if (search_window_half_width==0):
-        search_window_half_width+=1
+    The histograms are processed together: every step is done on all of
+    them at once, the windows being gathered in a single array.
     
-    first_part_rows=[]
-    peak_index = signal_max_index
-    while (peak_index > 0):
-        correction_to_global_max_index = Get_Corrected_Peak_Index(_histogram,
-                                                                  peak_index,
-                                                                  search_window_half_width)
-        corrected_peak_index = peak_index + correction_to_global_max_index
-        
-        if (_histogram[corrected_peak_index] > 0):
-            first_part_rows += [corrected_peak_index*_bin_div]
-        
-        peak_index = corrected_peak_index - _period
-        
+    _period (number or array):
+        periods in bins. They can be floats: the expected positions are then
+        rounded to the nearest bin.
     
-    second_part_rows=[]
-    peak_index = signal_max_index
-    while (peak_index < _histogram.size):
-        correction_to_global_max_index = Get_Corrected_Peak_Index(_histogram,
-                                                                  peak_index,
-                                                                  search_window_half_width)
-        corrected_peak_index = peak_index + correction_to_global_max_index
-        
-        if (_histogram[corrected_peak_index] > 0):
-            second_part_rows += [corrected_peak_index*_bin_div]
-        
-        peak_index = corrected_peak_index + _period
+    _interpolation (string or None):
+        "parabolic" or "gaussian" to locate each peak between the bins with
+        its two neighbours (see periodicity.peak_offsets). The positions are
+        then floats.
+    
+    Returns one list per histogram of the positions of the peaks (bin index
+    multiplied by _bin_div), from the beginning to the end of the histogram
+    """
+    histograms = np.atleast_2d(_histograms)
+    (nb_histograms, nb_bins) = histograms.shape
+    periods = np.broadcast_to(np.asarray(_period), (nb_histograms,))
+    
+    half_widths = np.maximum((0.1*periods).astype(np.int64), 1)
+    offsets = np.arange(-half_widths.max(initial=1), half_widths.max(initial=1)+1)
+    #values outside of the windows can never be the maximum
+    out_of_window = np.abs(offsets) > half_widths[:,None]
     
+    #global maximum, last one in case of equality
+    signal_max_indeces = nb_bins-1 - np.argmax(histograms[:,::-1], axis=1)
     
-    return first_part_rows[::-1]+second_part_rows[1:]
+    peaks = [[[] for _h in range(nb_histograms)] for _direction in (-1, 1)]
+    for _d, _direction in enumerate((-1, 1)):
+        peak_indeces = signal_max_indeces.copy()
+        if (_direction < 0):
+            active = peak_indeces > 0
+        else:
+            active = peak_indeces < nb_bins
+        while (np.any(active)):
+            rows = np.flatnonzero(active)
+            windows = peak_indeces[rows,None] + offsets
+            values = np.where(out_of_window[rows] | (windows < 0) | (windows > nb_bins-1),
+                              -1,
+                              histograms[rows[:,None], np.clip(windows, 0, nb_bins-1)])
+            corrections = values.shape[1]-1 - np.argmax(values[:,::-1], axis=1)
+            corrected_peak_indeces = windows[np.arange(rows.size), corrections]
+            
+            kept = histograms[rows, corrected_peak_indeces] > 0
+            if (_interpolation != None):
+                positions = corrected_peak_indeces + Peak_Offsets(histograms[rows],
+                                                                  corrected_peak_indeces,
+                                                                  _interpolation)
+                for _r, _p in zip(rows[kept], positions[kept]):
+                    peaks[_d][_r].append(float(_p)*_bin_div)
+            else:
+                for _r, _c in zip(rows[kept], corrected_peak_indeces[kept]):
+                    peaks[_d][_r].append(int(_c)*_bin_div)
+            
+            next_peak_indeces = np.rint(corrected_peak_indeces + _direction*periods[rows]).astype(np.int64)
+            if (_direction < 0):
+                peak_indeces[rows] = np.minimum(next_peak_indeces, peak_indeces[rows]-1)
+                active[rows] = peak_indeces[rows] > 0
+            else:
+                peak_indeces[rows] = np.maximum(next_peak_indeces, peak_indeces[rows]+1)
+                active[rows] = peak_indeces[rows] < nb_bins
+    
+    #the global maximum is the first peak found in both directions
+    return [peaks[0][_h][::-1]+peaks[1][_h][1:] for _h in range(nb_histograms)]
+
+def Search_Periodic_Peaks(_histogram, _period, _bin_div, _interpolation=None):
+    """
+    Search_Periodic_Peaks_Batch on a single histogram
+    """
+    return Search_Periodic_Peaks_Batch(_histogram, _period, _bin_div, _interpolation)[0]
+
+def Peak_Offsets(_histograms, _peak_indeces, _interpolation="parabolic"):
+    """
+    Sub-bin offsets (see periodicity.peak_offsets) of the peaks of index
+    _peak_indeces[i] in the histograms _histograms[i]. The peaks on the
+    first or the last bin are not moved.
+    """
+    nb_bins = _histograms.shape[1]
+    rows = np.arange(_histograms.shape[0])
+    left = _histograms[rows, np.maximum(_peak_indeces-1, 0)]
+    right = _histograms[rows, np.minimum(_peak_indeces+1, nb_bins-1)]
+    offsets = periodicity.peak_offsets(left, _histograms[rows, _peak_indeces], right,
+                                       _interpolation)
+    inside = (_peak_indeces > 0) & (_peak_indeces < nb_bins-1)
+    return np.where(inside, offsets, 0)
 
 def Extract_Y_Coord_of_Crop_Rows(_crop_rows,
                                  _x_data_size, _x_period,
                                  _x_coord, _y_coord):
+    """
+    Y coordinates of the points (_x_coord, _y_coord) of every crop row. The
+    points of a crop row are the ones whose X coordinate is strictly inside
+    the window of half width 5% of _x_period around the crop row (the
+    boundaries of the windows are clamped between 0 and _x_data_size-1).
     
+    The points are sorted once on X and the windows are found with
+    np.searchsorted: the content of each crop row is a view on the sorted Y
+    coordinates. A point belongs at most to one crop row (the first one) if
+    windows overlap.
+    
+    Returns one array per crop row of _crop_rows (empty if no point falls in
+    its window)
+    """
     window_half_width = int(0.05*_x_period)
-    _x_coord_sort_indeces = np.argsort(_x_coord)
+    _x_coord_sort_indeces = np.argsort(_x_coord, kind="stable")
     _x_coord_sorted = _x_coord[_x_coord_sort_indeces]
     _y_coord_sorted_on_x = _y_coord[_x_coord_sort_indeces]
     
-    _y_coords_per_crop_row = []
-    crops_rows_count = 0
-    nb_crops_rows = len(_crop_rows)
-    all_rows_parsed = False
-    
-    i = 0
-    subset_low_boundary = Clamp_Value(_crop_rows[crops_rows_count]-window_half_width,
-                                      0,
-                                      _x_data_size-1)
-    subset_high_boundary = Clamp_Value(_crop_rows[crops_rows_count]+window_half_width+1,
-                                       0,
-                                       _x_data_size-1)
-    _row_content=[]
-    while i < _x_data_size and not all_rows_parsed:
-        if (_x_coord_sorted[i]>subset_low_boundary):
-            if (_x_coord_sorted[i]<subset_high_boundary):
-                _row_content += [_y_coord_sorted_on_x[i]]
-                i+=1
-            else:
-                _y_coords_per_crop_row.append(_row_content)
-                _row_content = []
-                crops_rows_count+=1
-                if (crops_rows_count < nb_crops_rows):
-                    subset_low_boundary = Clamp_Value(_crop_rows[crops_rows_count]-window_half_width,
-                                          0,
-                                          _x_data_size-1)
-                    subset_high_boundary = Clamp_Value(_crop_rows[crops_rows_count]+window_half_width+1,
-                                           0,
-                                           _x_data_size-1)
-                else:
-                    all_rows_parsed = True
-                
-        else:
-            i += 1
+    crop_rows = np.asarray(_crop_rows, dtype=np.float64)
+    subset_low_boundaries = np.clip(crop_rows-window_half_width, 0, _x_data_size-1)
+    subset_high_boundaries = np.clip(crop_rows+window_half_width+1, 0, _x_data_size-1)
+    
+    #first point strictly above the low boundary and first point not
+    #strictly below the high boundary of every window
+    starts = np.searchsorted(_x_coord_sorted, subset_low_boundaries, side="right")
+    stops = np.searchsorted(_x_coord_sorted, subset_high_boundaries, side="left")
+    
+    #the points are distributed in the order of the crops rows: a window
+    #starts after the end of the previous one
+    stops = np.maximum.accumulate(np.maximum(starts, stops))
+    starts = np.maximum(starts, np.concatenate(([0], stops[:-1])))
+    
+    return [_y_coord_sorted_on_x[_start:_stop] for _start, _stop in zip(starts, stops)]
+
+class Uniform_Bins:
+    """
+    _nb_bins bins of the same width between 0 and _axis_size. Equivalent to
+    np.histogram(data, bins=_nb_bins, range=(0, _axis_size)): a value falls
+    in the bin i if edges[i] <= value < edges[i+1], the last bin includes
+    _axis_size and the values outside of [0, _axis_size] are ignored.
+    """
+    def __init__(self, _axis_size, _nb_bins):
+        self.axis_size = _axis_size
+        self.nb_bins = _nb_bins
+        self.edges = np.linspace(0, _axis_size, _nb_bins+1)
+        #bin of every integer coordinate from 0 to _axis_size
+        self.table = np.minimum(np.searchsorted(self.edges, np.arange(_axis_size+1), side="right")-1,
+                                _nb_bins-1)
     
-    if (not all_rows_parsed):
-        _y_coords_per_crop_row.append(_row_content)
+    def indices(self, _data):
+        """
+        Bins of the values of _data, which must be inside [0, axis_size]
+        """
+        data = np.asarray(_data)
+        if (data.dtype.kind in "iu"):
+            return self.table[data]
+        return np.minimum(np.searchsorted(self.edges, data, side="right")-1,
+                          self.nb_bins-1)
+    
+    def histograms(self, _data_list, _out):
+        """
+        Histograms of every array of _data_list, written in the lines of _out,
+        with a single np.bincount call
+        """
+        lengths = [np.size(_d) for _d in _data_list]
+        rows = np.repeat(np.arange(len(_data_list)), lengths)
+        values = np.concatenate([np.ravel(_d) for _d in _data_list] + [np.zeros(0, dtype=np.int64)])
+        inside = (values >= 0) & (values <= self.axis_size)
+        _out[...] = np.bincount(rows[inside]*self.nb_bins + self.indices(values[inside]),
+                                minlength=len(_data_list)*self.nb_bins
+                                ).reshape(_out.shape)
+        return _out
+
+class Analysis_Context:
+    """
+    Everything the Fourier analysis of an image needs that only depends on
+    the size of the image and on the parameters: the bins of the histograms
+    on both axes, the window of the FFT and the buffers of the histograms.
+    The images of a flight all have the same size, so the context is built
+    once (see Get_Analysis_Context) and reused for every image.
+    
+    The histograms returned by the methods are the buffers of the context:
+    they are overwritten by the analysis of the next image.
+    
+    _interpolation is the interpolation of the peaks of the spectrum (see
+    periodicity.dominant_frequencies).
+    """
+    def __init__(self, _lines, _columns, _bin_div_X=2, _bin_div_Y=4,
+                 _padding_factor=1, _window=None, _fft_workers=None,
+                 _interpolation=None):
+        self.bins_X = Uniform_Bins(_columns, int(_columns/_bin_div_X))
+        self.bins_Y = Uniform_Bins(_lines, int(_lines/_bin_div_Y))
+        
+        self.padding_factor = _padding_factor
+        self.fft_workers = _fft_workers
+        self.interpolation = _interpolation
+        self.window_X = None
+        self.window_Y = None
+        if (_window != None):
+            self.window_X = periodicity.WINDOWS[_window](self.bins_X.nb_bins)
+            self.window_Y = periodicity.WINDOWS[_window](self.bins_Y.nb_bins)
         
-    return _y_coords_per_crop_row
+        self.histogram_X = np.zeros((1, self.bins_X.nb_bins), dtype=np.int64)
+        #one line per crop row, grown when an image has more crops rows
+        self.histograms_Y = np.zeros((0, self.bins_Y.nb_bins), dtype=np.int64)
+    
+    def signal_period_X(self, _X):
+        """
+        Histogram of the X coordinates _X and its period
+        """
+        self.bins_X.histograms([_X], self.histogram_X)
+        signal_period = periodicity.signal_periods(self.histogram_X[0], self.padding_factor,
+                                                   self.window_X, self.fft_workers,
+                                                   self.interpolation)
+        return self.histogram_X[0], signal_period
+    
+    def signal_periods_Y(self, _Y_list):
+        """
+        Histograms of every set of Y coordinates of _Y_list (for example the
+        Y coordinates of every crop row) and their periods, computed with a
+        single FFT call.
+        
+        Returns the histograms (one per line of a 2D array) and the periods
+        """
+        if (self.histograms_Y.shape[0] < len(_Y_list)):
+            self.histograms_Y = np.zeros((len(_Y_list), self.bins_Y.nb_bins), dtype=np.int64)
+        histograms = self.bins_Y.histograms(_Y_list, self.histograms_Y[:len(_Y_list)])
+        signal_periods = periodicity.signal_periods(histograms, self.padding_factor,
+                                                    self.window_Y, self.fft_workers,
+                                                    self.interpolation)
+        return histograms, signal_periods
 
-def Get_Signal_Period(_data, _axis_size, _bin_div):
-    histogram = np.histogram(_data, bins=int(_axis_size/_bin_div), range=(0, _axis_size))
-    power, freq = Compute_Power_and_Freq(histogram[0])
-    signal_freq = Get_Signal_Freq(power, freq)
-    signal_period = int(1/signal_freq)
+#contexts already built in this process, see Get_Analysis_Context
+ANALYSIS_CONTEXTS = {}
+
+def Get_Analysis_Context(_lines, _columns, _bin_div_X=2, _bin_div_Y=4,
+                         _padding_factor=1, _window=None, _fft_workers=None,
+                         _interpolation=None):
+    """
+    Returns the Analysis_Context of these parameters, built at the first call
+    and then reused.
+    """
+    key = (_lines, _columns, _bin_div_X, _bin_div_Y, _padding_factor, _window,
+           _fft_workers, _interpolation)
+    if (not key in ANALYSIS_CONTEXTS):
+        ANALYSIS_CONTEXTS[key] = Analysis_Context(*key)
+    return ANALYSIS_CONTEXTS[key]
+
+def Fourier_Analysis_Image(_bsas_content_dir0, _bsas_content_dir1,
+                           _bin_div_X=2, _bin_div_Y=4,
+                           _padding_factor=1, _window=None, _fft_workers=None,
+                           _interpolation="parabolic"):
+    """
+    Fourier Analysis of one image.
     
-# =============================================================================
-#     print("signal_freq", signal_freq)
-# 
-#     plt.subplot(212)
-#     plt.scatter(freq, power)
-# =============================================================================
+    _bsas_content_dir0, _bsas_content_dir1 (tuples):
+        centroids of the BSAS in the directions 0 and 1 as (lines, columns, X, Y),
+        as returned by get_bsas_file_content or by
+        bsas.BSAS_Process.get_centroids_content
+    
+    _padding_factor, _window, _fft_workers:
+        options of the FFT of the histograms (see periodicity.power_spectrum)
+    
+    _interpolation (string or None):
+        "parabolic" (default) or "gaussian" to locate the peaks of the
+        spectrum and of the histograms between the bins (see
+        periodicity.peak_offsets). The periods and the predicted positions
+        are then floats. With None they are integers, multiple of the bins.
+    
+    Returns the predicted plants positions (one list of [x, y] per crop row)
+    and the number of predictions.
+    """
+    (lines, columns, X, Y) = _bsas_content_dir0
+    context = Get_Analysis_Context(lines, columns, _bin_div_X, _bin_div_Y,
+                                   _padding_factor, _window, _fft_workers,
+                                   _interpolation)
+    
+################## Analyse signal on X axis            
+    histogram, signal_period = context.signal_period_X(X)
+    crops_rows = Search_Periodic_Peaks(histogram, signal_period, _bin_div_X,
+                                       _interpolation)
+    nb_rows = len(crops_rows)
+    print("nb_rows:", nb_rows)
+    
+################## Analyse signal on Y axis
+    X2,Y2 = _bsas_content_dir1[2:]
+    crops_rows_content = Extract_Y_Coord_of_Crop_Rows(
+                                        crops_rows,
+                                        X2.size, signal_period*_bin_div_X,
+                                        X2, Y2)
+    
+    #For the analysis on axis Y we separate the detection of the signal period
+    #and the search of the peaks. We agglomerate the signal periods of all
+    #the crops rows by taking the median. This is necessary because the
+    #signal of the Y axis is usually less clear than the signal on the X
+    #axis.
+    #The histograms of all the crops rows have the same size: their periods
+    #are computed together.
+    all_histograms_per_CR, all_period_per_CR = context.signal_periods_Y(crops_rows_content)
+    
+    print("all_period_per_CR:", all_period_per_CR.tolist())
+    signal_period = float(np.median(all_period_per_CR))
+    if (_interpolation == None):
+        signal_period = int(signal_period)
+    #signal_period = int(min(all_period_per_CR))
+    print("signal_period:", signal_period)
+    predicted_plants_Y_per_crop_rows = Search_Periodic_Peaks_Batch(
+                                        all_histograms_per_CR, signal_period, _bin_div_Y,
+                                        _interpolation)
+    
+    
+################## Reorganise plant coordinates
+    #the json files only take python numbers
+    coordinate_type = int if _interpolation == None else float
+    predicted_FT = []
+    nb_predictions = 0
+    for j in range(nb_rows):
+        current_CR_content = predicted_plants_Y_per_crop_rows[j]
+        crops_coord_in_CR = []
+        for _plant_height in current_CR_content:
+            crops_coord_in_CR.append([coordinate_type(crops_rows[j]),
+                                      coordinate_type(_plant_height)])
+            nb_predictions+=1
+        predicted_FT.append(crops_coord_in_CR)
+    
+    return predicted_FT, nb_predictions
+
+def Fourier_Analysis_Worker(_img_id, _bsas_dir0, _bsas_dir1,
+                            _bin_div_X=2, _bin_div_Y=4,
+                            _padding_factor=1, _window=None, _fft_workers=None,
+                            _interpolation="parabolic"):
+    """
+    Fourier_Analysis_Image on one image. _bsas_dir0 and _bsas_dir1 are either
+    the paths of the bsas files of the image, which are then read here, or
+    their content. It is a module level function so that it can be sent to
+    the processes of the worker pool.
+    """
+    print("Fourier Analysis of image", _img_id)
+    if (isinstance(_bsas_dir0, str)):
+        _bsas_dir0 = get_bsas_file_content(_bsas_dir0)
+    if (isinstance(_bsas_dir1, str)):
+        _bsas_dir1 = get_bsas_file_content(_bsas_dir1)
     
-    return histogram, signal_period
+    return Fourier_Analysis_Image(_bsas_dir0, _bsas_dir1,
+                                  _bin_div_X, _bin_div_Y,
+                                  _padding_factor, _window, _fft_workers,
+                                  _interpolation)
 
 def All_Fourier_Analysis(_path_input_output,
                          _session_number=1,
-                         _bin_div_X=2, _bin_div_Y=4):
+                         _bin_div_X=2, _bin_div_Y=4,
+                         _centroids=None,
+                         _padding_factor=1, _window=None,
+                         _nb_workers=1, _fft_workers=None,
+                         _interpolation="parabolic"):
+    """
+    Analyses every image of the session. The images are streamed: the bsas
+    files of an image are only read when the image is analysed, so the
+    memory used does not depend on the number of images. The predictions
+    of the i-th image, in the order of the image ids, are saved in
+    PredictedRows_Img_<i>_<number of predictions>.json.
     
+    _centroids (dict, optional):
+        centroids of the BSAS of every image, as returned by
+        Process_image_for_FT.All_Pre_Treatment with _return_centroids=True.
+        If given, the bsas files are not read.
+    
+    _padding_factor, _window:
+        options of the FFT of the histograms (see periodicity.power_spectrum)
+    
+    _nb_workers (int or None):
+        number of processes analysing the images (see Imap_Workers)
+    
+    _fft_workers (int or None):
+        number of threads of every FFT (see periodicity.rfft)
+    
+    _interpolation (string or None):
+        sub-bin interpolation of the peaks (see Fourier_Analysis_Image)
+    """
 ################## Paths and parameters definition
     
     path_input_root = _path_input_output+"/Output/Session_"+str(_session_number)
@@ -218,83 +551,26 @@ def All_Fourier_Analysis(_path_input_output,
     path_input_bsas_dir0 = path_input_bsas+"/direction_0"
     path_input_bsas_dir1 = path_input_bsas+"/direction_1"
     
-    names_input_bsas_dir0 = os.listdir(path_input_bsas_dir0)
-    names_input_bsas_dir1 = os.listdir(path_input_bsas_dir1)
-    
     path_output_FT_predictions = path_output_root+"/Plant_FT_Predictions"
     gIO.check_make_directory(path_output_FT_predictions)
     
-    subset_size = 4
-    
-################## Import Data
-    data_bsas_dir0 = import_data(path_input_bsas_dir0,
-                                 names_input_bsas_dir0[:subset_size],
-                                 get_file_lines)
+################## Images Definition
+    if (_centroids != None):
+        bsas_data = [(_id, _centroids[_id][0], _centroids[_id][1])
+                     for _id in sorted(_centroids)]
+    else:
+        bsas_data = List_BSAS_Files(path_input_bsas_dir0, path_input_bsas_dir1)
+    print("Fourier Analysis of {0} images".format(len(bsas_data)))
     
-    data_bsas_dir1 = import_data(path_input_bsas_dir1,
-                                 names_input_bsas_dir1[:subset_size],
-                                 get_file_lines)
+    predictions = Imap_Workers(Fourier_Analysis_Worker,
+                               ((_id, _bsas_dir0, _bsas_dir1,
+                                 _bin_div_X, _bin_div_Y,
+                                 _padding_factor, _window, _fft_workers,
+                                 _interpolation)
+                                for _id, _bsas_dir0, _bsas_dir1 in bsas_data),
+                               _nb_workers)
     
-    nb_images = len(data_bsas_dir0)
-    
-    for i in range (nb_images):
-        size_str = data_bsas_dir0[i][0].split('*')
-        (lines, columns) = (int(size_str[0]), int(size_str[1]))
-        
-        X,Y = separate_X_Y_from_bsas_files(data_bsas_dir0[i])
-        
-        
-################## Analyse signal on X axis            
-        histogram, signal_period = Get_Signal_Period(X, columns, _bin_div_X)
-        crops_rows = Search_Periodic_Peaks(histogram[0], signal_period, _bin_div_X)
-        nb_rows = len(crops_rows)
-        print("nb_rows:", nb_rows)
-        
-################## Analyse signal on Y axis
-        X2,Y2 = separate_X_Y_from_bsas_files(data_bsas_dir1[i])
-        crops_rows_content = Extract_Y_Coord_of_Crop_Rows(
-                                            crops_rows,
-                                            X2.size, signal_period*_bin_div_X,
-                                            X2, Y2)
-        
-        #For the analysis on axis Y we separate the detection of the signal period
-        #and the search of the peaks. We agglomerate the signal periods of all
-        #the crops rows by taking the median. This is necessary because the
-        #signal of the Y axis is usually less clear than the signal on the X
-        #axis.
-        all_histograms_per_CR = []
-        all_period_per_CR=[]
-        for _cr_content in crops_rows_content:
-# =============================================================================
-#                   plt.figure()
-#                   plt.subplot(211)
-#                   plt.hist(_cr_content, bins=int(lines/bins_div_Y))
-# =============================================================================
-            histogram, signal_period = Get_Signal_Period(_cr_content, lines, _bin_div_Y)
-            all_histograms_per_CR.append(histogram)
-            all_period_per_CR.append(signal_period)
-        
-        predicted_plants_Y_per_crop_rows = []
-        print("all_period_per_CR:", all_period_per_CR)
-        signal_period = int(np.median(all_period_per_CR))
-        #signal_period = int(min(all_period_per_CR))
-        print("signal_period:", signal_period)
-        for j in range(nb_rows):
-            predicted_plants = Search_Periodic_Peaks(all_histograms_per_CR[j][0], signal_period, _bin_div_Y)
-            predicted_plants_Y_per_crop_rows += [predicted_plants]
-        
-        
-################## Reorganise plant coordinates
-        predicted_FT = []
-        nb_predictions = 0
-        for j in range(nb_rows):
-            current_CR_content = predicted_plants_Y_per_crop_rows[j]
-            crops_coord_in_CR = []
-            for _plant_height in current_CR_content:
-                crops_coord_in_CR.append([int(crops_rows[j]), int(_plant_height)])
-                nb_predictions+=1
-            predicted_FT.append(crops_coord_in_CR)
-        
+    for i, (predicted_FT, nb_predictions) in enumerate(predictions):
 ################## Save the predictions in json file
         _file_name="PredictedRows_Img_"+str(i)+"_"+str(nb_predictions)
         gIO.WriteJson(path_output_FT_predictions, _file_name, predicted_FT)
@@ -310,4 +586,7 @@ if (__name__ == "__main__"):
     
     All_Fourier_Analysis(_path_input_output="../Tutorial/Output_General/Set1",
                          _session_number=1,
-                         _bin_div_X=2, _bin_div_Y=4)
+                         _bin_div_X=2, _bin_div_Y=4,
+                         _padding_factor=1, _window=None,
+                         _nb_workers=1, _fft_workers=None,
+                         _interpolation="parabolic")
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Periodicity of 1D signals (histograms of the positions of the white pixels)
+with the real FFT.
+
+The signals are real, so only the non negative frequencies are computed
+(np.fft.rfft). Several signals of the same length (for example the
+histograms of all the crops rows of an image) are given as the lines of a 2D
+array and analysed with a single FFT call.
+
+Options:
+    - padding: the signals are padded with zeros to _padding_factor times
+    their length before the FFT. The spectrum is then sampled more finely,
+    which interpolates the frequency of the peak between the frequencies of
+    the unpadded FFT.
+    - window: the signals can be multiplied by a window function ("hann",
+    "hamming" or "blackman") to reduce the spectral leakage.
+With one of these options, the mean of the signals is removed before the FFT.
+With the default values (no padding, no window), the frequencies are the
+same as the ones found on the complex FFT of the signal.
+
+The peaks (of the spectrum here, of the histograms in FrequencyAnalysis.py)
+can be located between two samples by fitting a parabola ("parabolic") or a
+gaussian ("gaussian", a parabola on the logarithm of the values) on the
+sample of the peak and its two neighbours (see peak_offsets).
+
+The FFT is computed by scipy.fft if it is installed: it can use several
+threads and caches the plans of the sizes already seen (the histograms of the
+images of a flight all have the same size). Otherwise numpy.fft is used.
+"""
+
+import numpy as np
+try:
+    import scipy.fft as scipy_fft
+except ImportError:
+    scipy_fft = None
+
+WINDOWS = {"hann": np.hanning, "hamming": np.hamming, "blackman": np.blackman}
+
+
+def rfft(_signals, _nb_points, _workers = None):
+    """
+    FFT of the real signals _signals along their last axis, on _nb_points
+    points. _workers is the number of threads used by scipy.fft (ignored by
+    numpy.fft).
+    """
+    if (scipy_fft != None):
+        return scipy_fft.rfft(_signals, n = _nb_points, axis = -1, workers = _workers)
+    return np.fft.rfft(_signals, n = _nb_points, axis = -1)
+
+def power_spectrum(_signals, _padding_factor = 1, _window = None,
+                   _workers = None):
+    """
+    _signals (array):
+        one signal (1D array) or a batch of signals of the same length (one
+        signal per line of a 2D array)
+
+    _padding_factor (int, min = 1):
+        the signals are padded with zeros to _padding_factor times their
+        length before the FFT
+
+    _window (string, array or None):
+        name of the window function applied to the signals (see WINDOWS), or
+        the window itself as an array of the length of the signals
+
+    _workers (int or None):
+        number of threads of the FFT (see rfft)
+
+    Returns the power of the non negative frequencies (same number of
+    dimensions as _signals) and the frequencies, in cycles per sample.
+    """
+    signals = np.asarray(_signals, dtype = np.float64)
+    size = signals.shape[-1]
+    if (_padding_factor > 1 or _window is not None):
+        #the lobes of the mean (frequency 0) spread on the low frequencies of
+        #a padded or windowed spectrum and would hide the peak of the signal
+        signals = signals - np.mean(signals, axis = -1, keepdims = True)
+    if (isinstance(_window, str)):
+        signals = signals*WINDOWS[_window](size)
+    elif (_window is not None):
+        signals = signals*_window
+
+    nb_points = size*_padding_factor
+    fourier = rfft(signals, nb_points, _workers)
+    power = np.absolute(fourier/size)**2
+    freq = np.fft.rfftfreq(nb_points, d = 1)
+
+    return power, freq
+
+def peak_offsets(_left, _center, _right, _interpolation = "parabolic"):
+    """
+    Position, relatively to the sample _center, of the top of the parabola
+    ("parabolic") or of the gaussian ("gaussian") going through the values
+    _left, _center and _right of three consecutive samples. The arguments
+    can be arrays of values of several peaks.
+
+    The gaussian needs positive values: where one of them is 0, the
+    parabolic offset is used. The offsets are 0 where the center is not a
+    local maximum and are limited to [-0.5, 0.5].
+    """
+    left = np.asarray(_left, dtype = np.float64)
+    center = np.asarray(_center, dtype = np.float64)
+    right = np.asarray(_right, dtype = np.float64)
+
+    if (_interpolation == "gaussian"):
+        positive = (left > 0) & (center > 0) & (right > 0)
+        with np.errstate(divide = "ignore"):
+            left = np.where(positive, np.log(np.where(positive, left, 1)), left)
+            center = np.where(positive, np.log(np.where(positive, center, 1)), center)
+            right = np.where(positive, np.log(np.where(positive, right, 1)), right)
+
+    curvature = left - 2*center + right
+    peak = (center >= left) & (center >= right) & (curvature < 0)
+    offsets = np.where(peak, 0.5*(left - right)/np.where(peak, curvature, -1), 0)
+
+    return np.clip(offsets, -0.5, 0.5)
+
+def dominant_frequencies(_power, _freq, _interpolation = None):
+    """
+    Frequency of the highest local rise of the power of every signal: the
+    highest power among the frequencies whose power is above the one of the
+    previous frequency (the first one in case of equality). The Nyquist
+    frequency of an even number of points and a spectrum that never rises
+    give the lowest non zero frequency.
+
+    _power, _freq: as returned by power_spectrum
+
+    _interpolation (string or None):
+        "parabolic" or "gaussian" to locate the peak of the power between
+        two frequencies (see peak_offsets). None keeps the frequency of the
+        highest sample.
+
+    Returns one frequency per signal (a float for a single signal)
+    """
+    power = np.atleast_2d(_power)
+    rises = np.where(power[:,1:] > power[:,:-1], power[:,1:], 0)
+    freq_index = np.argmax(rises, axis = 1) + 1
+
+    no_rise = rises[np.arange(power.shape[0]), freq_index-1] <= 0
+    #the Nyquist frequency is also the negative frequency -0.5 of the
+    #complex FFT, which is not a valid period
+    nyquist = (freq_index == _freq.size-1) & np.isclose(_freq[-1], 0.5)
+    freq_index[no_rise | nyquist] = 1
+
+    frequencies = _freq[freq_index]
+    if (_interpolation != None):
+        #only the peaks with a neighbour on each side are interpolated
+        interpolated = ~(no_rise | nyquist) & (freq_index < _freq.size-1)
+        rows = np.flatnonzero(interpolated)
+        index = freq_index[rows]
+        offsets = peak_offsets(power[rows, index-1], power[rows, index],
+                               power[rows, index+1], _interpolation)
+        frequencies[rows] += offsets*(_freq[1] - _freq[0])
+    if (np.ndim(_power) == 1):
+        return frequencies[0]
+    return frequencies
+
+def signal_periods(_signals, _padding_factor = 1, _window = None,
+                   _workers = None, _interpolation = None):
+    """
+    Periods, in number of samples, of the dominant frequency of every signal
+    of _signals (see power_spectrum and dominant_frequencies).
+
+    Returns one period per signal (a number for a single signal). Without
+    _interpolation the periods are truncated to integers, otherwise they are
+    floats.
+    """
+    power, freq = power_spectrum(_signals, _padding_factor, _window, _workers)
+    periods = 1/np.asarray(dominant_frequencies(power, freq, _interpolation))
+    if (_interpolation == None):
+        periods = periods.astype(int)
+    if (periods.ndim == 0):
+        return periods.item()
+    return periods
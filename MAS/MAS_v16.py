@@ -93,7 +93,7 @@ class ReactiveAgent(object):
         Sets self.decision to True if the pixel where the RA is present is white.
         Sets to False otherwise.
         """
-        if (self.img_array[self.global_y, self.global_x][0] > 220):
+        if (self.img_array[self.global_y, self.global_x] > 220):
             self.decision = True
         else:
             self.decision = False
@@ -360,9 +360,11 @@ class Row_Agent(object):
 #         print()
 # =============================================================================
         
+        #the predictions of the Fourier Analysis can be between two pixels:
+        #the RALs start on the nearest pixel
         for _plant_pred in self.plant_FT_pred_in_crop_row:
-            RAL = ReactiveAgent_Leader(_x = _plant_pred[0],
-                                       _y = self.OTSU_img_array.shape[0] - _plant_pred[1],
+            RAL = ReactiveAgent_Leader(_x = int(round(_plant_pred[0])),
+                                       _y = self.OTSU_img_array.shape[0] - int(round(_plant_pred[1])),
                                        _img_array = self.OTSU_img_array,
                                        _group_size = self.group_size,
                                        _group_step = self.group_step,
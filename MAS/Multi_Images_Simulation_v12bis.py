@@ -14,6 +14,7 @@ import MAS_v16 as MAS
 
 os.chdir("../Utility")
 import general_IO as gIO
+import mask_IO
 
 
 # =============================================================================
@@ -58,10 +59,16 @@ def All_Simulations(_path_input_rgb_img, _path_PreTreatment_and_FA,
     # Files Names Collection
     # =============================================================================
     
-    names_input_raw = os.listdir(_path_input_rgb_img)
+    #The three lists are in the order of the image ids: the rotated Otsu
+    #masks are sorted by name and the i-th prediction file of the Fourier
+    #Analysis (PredictedRows_Img_<i>_<nb predictions>) is the one of the
+    #i-th image id.
+    names_input_raw = sorted(os.listdir(_path_input_rgb_img),
+                             key = lambda _name: _name.split('.')[0])
     #names_input_adjusted_position_files = os.listdir(path_input_adjusted_position_files)
-    names_input_OTSU = os.listdir(path_input_OTSU)
-    names_input_PLANT_FT_PRED = os.listdir(path_input_PLANT_FT_PRED)
+    names_input_OTSU = mask_IO.list_masks(path_input_OTSU)
+    names_input_PLANT_FT_PRED = sorted(os.listdir(path_input_PLANT_FT_PRED),
+                                       key = lambda _name: int(_name.split('_')[2]))
     
     # =============================================================================
     # Data Collection
@@ -73,7 +80,7 @@ def All_Simulations(_path_input_rgb_img, _path_PreTreatment_and_FA,
     #                                           names_input_adjusted_position_files,
     #                                           get_file_lines)
     data_adjusted_position_files = None
-    data_input_OTSU = import_data(path_input_OTSU, names_input_OTSU, get_img_array)
+    data_input_OTSU = import_data(path_input_OTSU, names_input_OTSU, mask_IO.load_mask_file)
     data_input_PLANT_FT_PRED = import_data(path_input_PLANT_FT_PRED,
                                            names_input_PLANT_FT_PRED,
                                            get_json_file_content)
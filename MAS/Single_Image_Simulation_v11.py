@@ -12,6 +12,9 @@ from PIL import Image
 
 import MAS_v16 as MAS
 
+os.chdir("../Utility")
+import mask_IO
+
 
 # =============================================================================
 # Utility Functions Definition
@@ -54,7 +57,7 @@ path_input_PLANT_FT_PRED = path_input_root+"/Output_General/Set1/Output_FA/Sessi
 
 names_input_raw = os.listdir(path_input_raw)
 #names_input_adjusted_position_files = os.listdir(path_input_adjusted_position_files)
-names_input_OTSU = os.listdir(path_input_OTSU)
+names_input_OTSU = mask_IO.list_masks(path_input_OTSU)
 names_input_PLANT_FT_PRED = os.listdir(path_input_PLANT_FT_PRED)
 
 # =============================================================================
@@ -74,7 +77,7 @@ data_input_raw = import_data(path_input_raw,
 # =============================================================================
 data_input_OTSU = import_data(path_input_OTSU,
                               names_input_OTSU[:subset_size],
-                              get_img_array)
+                              mask_IO.load_mask_file)
 data_input_PLANT_FT_PRED = import_data(path_input_PLANT_FT_PRED,
                                        names_input_PLANT_FT_PRED[:subset_size],
                                        get_json_file_content)
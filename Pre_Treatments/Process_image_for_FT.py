@@ -24,6 +24,30 @@ variables the user can change:
     
     - do_Otsu (bool): Controls whether the Otsu segmentation should be performed
     
+    - Otsu_pooled_threshold (bool): If set to True, a single Otsu threshold is
+    computed on the pooled ExG histograms of all the images of the flight and
+    applied to every image. If set to False, each image gets its own threshold.
+    
+    - Otsu_tile_size (int or None): If set, the Otsu masks are computed by
+    tiles of Otsu_tile_size x Otsu_tile_size pixels (see
+    tiled.Tiled_Segmentation) so that images larger than the memory, such as
+    orthomosaics, can be segmented. None (default) segments every image in
+    memory. With Otsu_pooled_threshold the histograms of the images are still
+    computed on the whole images.
+    
+    - mask_format (string): format of the Otsu masks passed to the next steps.
+    "NPY" (default) or "PNG" are lossless and read back directly as binary
+    masks; "JPEG" is lossy and re-thresholded when read.
+    
+    - rotated_mask_format (string or None): format of the rotated Otsu masks
+    (Otsu_R). None (default) uses mask_format. With "ROT" the rotated masks are
+    not rendered: the BSAS and the Multi Agent System read the pixels of the
+    Otsu masks through the rotation, and only the angle and the path of the
+    Otsu mask are saved in Otsu_R.
+    
+    - save_mask_previews (bool): If set to True, a JPEG preview of every Otsu
+    mask is also saved when mask_format is lossless.
+    
     - do_AD (bool): Controls whether the crops rows Angle Detection should be
     performed
     
@@ -31,6 +55,47 @@ variables the user can change:
     the rotation score. The rotation score is used to detect the angle of the
     crops rows. We want the angle with the minimum score value.
     
+    - AD_angle_steps (tuple of numbers): successive steps (in degrees) of the
+    coarse to fine search of the crops rows angle. (5, 1) is the default;
+    (5, 1, 0.1) adds a sub-degree refinement; (1,) evaluates every degree.
+    
+    - AD_sampling (string or None): points used by the angle detection. None
+    uses every white pixel of the Otsu mask; "random" draws AD_sampling_size
+    white pixels (default 100000); "grid" draws one white pixel in every cell of
+    AD_sampling_size x AD_sampling_size pixels (default 4); "BSAS" uses the
+    centroids of the BSAS of the lines and the columns of the Otsu mask. The
+    random draws use a fixed seed so that the results are reproducible.
+    
+    - AD_sampling_size (int or None): see AD_sampling
+    
+    - AD_engine (string): score used by the angle detection. "occupancy"
+    (default) counts the columns occupied by the points of AD_sampling after
+    rotation. "projection" scores the projection profile of the Otsu mask
+    downsampled by AD_downsampling (AD_sampling is then not used).
+    
+    - AD_downsampling (int, min = 1): size of the cells of the downsampled
+    mask of the "projection" engine
+    
+    - AD_seed_sample (int or None): number of seed images for the incremental
+    voting of the angle. With None (default) the full search is done on every
+    image. Otherwise the full search is only done on AD_seed_sample images
+    spread over the flight; every other image only searches a window of plus
+    or minus AD_window degrees around the angle voted so far. If the best
+    angle of an image is on the edge of its window, the full search is done
+    for this image.
+    
+    - AD_window (number): half width in degrees of the search window of the
+    incremental voting (see AD_seed_sample)
+    
+    - AD_vote_resolution (number): width in degrees of the bins of the vote on
+    the angle of the images. The voted angle is the mean of the angles in the
+    bin with the most votes. 1 (default) keeps the integer degrees; use for
+    example 0.1 with AD_angle_steps = (5, 1, 0.1).
+    
+    - AD_vote_smoothing (number): standard deviation in degrees of the
+    gaussian smoothing of the histogram of the votes. 0 (default) means no
+    smoothing.
+    
     - bsas_threshold (int, min = 1): threshold for the inter cluster distance
     in the BSAS processus. A value of X means that a new cluster will be formed
     when there are X black pixels or more separating two white pixels. For reminder
@@ -39,6 +104,14 @@ variables the user can change:
     - save_BSAS_images (bool): controls whether we save the image resulting of
     the BSAS procesusus
     
+    - centroids_format (string): format of the files of the BSAS centroids. With
+    "NPY" (default) they are saved as binary int32 arrays that the Fourier
+    Analysis reads with memory mapping. "TXT" is the older text format.
+    
+    - nb_workers (int or None, min = 1): number of processes used to treat the
+    images in parallel. With 1 (default) the images are treated one after the
+    other. With None, one process per CPU core is used.
+    
     - path_input (string): directory of the raw RGB images of the crop field
      
     - path_output_root (string): root directory from where the results will
@@ -49,12 +122,17 @@ variables the user can change:
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 os.chdir("../Utility")
 import general_IO as gIO
+import mask_IO
 
 os.chdir("../Segmentation_Otsu")
 import data
+import batch
+import tiled
 
 os.chdir("../BSAS")
 import bsas
@@ -63,11 +141,193 @@ os.chdir("../Crops_Rows_Angle_Detection")
 import CRAD
 
 
+# =============================================================================
+# Per image workers
+# They are module level functions so that they can be sent to the processes
+# of the worker pool.
+# =============================================================================
+def Map_Workers(_worker, _args_list, _nb_workers=1):
+    """
+    Calls _worker on every tuple of arguments of _args_list and returns the
+    results in the same order. If _nb_workers is not 1, the calls are
+    distributed on a pool of _nb_workers processes.
+    """
+    if (_nb_workers == 1):
+        return [_worker(*_args) for _args in _args_list]
+    
+    with ProcessPoolExecutor(max_workers=_nb_workers) as executor:
+        futures = [executor.submit(_worker, *_args) for _args in _args_list]
+        return [_f.result() for _f in futures]
+
+def Otsu_Worker(_image_name, _path_input_rgb_img, _path_output_Otsu,
+                _Otsu_threshold=None,
+                _mask_format="NPY", _save_mask_previews=False,
+                _Otsu_tile_size=None):
+    print ("Processing Otsu mask for image", _image_name)
+    if (_Otsu_tile_size != None):
+        Tiled_Otsu_Worker(_image_name, _path_input_rgb_img, _path_output_Otsu,
+                          _Otsu_threshold, _mask_format, _save_mask_previews,
+                          _Otsu_tile_size)
+        return
+    
+    image = data.Data(_image_name, _path_input_rgb_img)
+    if (_Otsu_threshold != None):
+        image.create_maskOtsu(10, _Otsu_threshold)
+    image.save("mask_Otsu", "OTSU_"+_image_name, path = _path_output_Otsu,
+               file_format = _mask_format)
+    if (_save_mask_previews and _mask_format != "JPEG"):
+        image.save("mask_Otsu", "OTSU_"+_image_name, path = _path_output_Otsu)
+
+def Tiled_Otsu_Worker(_image_name, _path_input_rgb_img, _path_output_Otsu,
+                      _Otsu_threshold=None,
+                      _mask_format="NPY", _save_mask_previews=False,
+                      _Otsu_tile_size=2048):
+    """
+    Same as Otsu_Worker with the segmentation by tiles of
+    tiled.Tiled_Segmentation: the image is never held in memory. The mask is
+    written as a NPY file; it is only loaded to be saved in another format.
+    """
+    mask_name = "OTSU_"+_image_name.split('.')[0]
+    paths = tiled.Tiled_Segmentation(os.path.join(_path_input_rgb_img, _image_name),
+                                     _path_output_Otsu, mask_name,
+                                     masks = ("Otsu",), start_threshold = 10,
+                                     tile_size = _Otsu_tile_size,
+                                     th_crops = _Otsu_threshold,
+                                     file_names = {"Otsu": mask_name+".npy"})
+    if (_mask_format != "NPY"):
+        mask = mask_IO.load_mask_file(paths["Otsu"])
+        mask_IO.save_mask(_path_output_Otsu, mask_name, mask, _mask_format)
+        del mask
+        os.remove(paths["Otsu"])
+    if (_save_mask_previews and _mask_format != "JPEG"):
+        mask_IO.save_mask(_path_output_Otsu, mask_name,
+                          mask_IO.load_mask(_path_output_Otsu, mask_name), "JPEG")
+
+def Get_AD_Coord_Map(_AD, _AD_sampling=None, _AD_sampling_size=None,
+                     _bsas_threshold=1, _AD_engine="occupancy", _AD_downsampling=4):
+    """
+    Builds the cloud of points of the angle detection _AD (see
+    CRAD.CRAD.get_coord_map and CRAD.CRAD.get_projection_map).
+    """
+    if (_AD_engine == "projection"):
+        _AD.get_projection_map(_AD_downsampling)
+        return
+    
+    centroids = None
+    if (_AD_sampling == "BSAS"):
+        centroids = bsas.run_length_BSAS_both_directions(_AD.Otsu_img_arr,
+                                                         _bsas_threshold)
+    _AD.get_coord_map(_AD_sampling, _AD_sampling_size, 0, centroids)
+
+def AD_Worker(_img_id, _path_output_Otsu, _path_output_Otsu_R,
+              _path_output_ADp_angle_search_score, _path_output_ADp_Images,
+              _save_AD_score_images=False, _AD_angle_steps=(5, 1),
+              _AD_sampling=None, _AD_sampling_size=None, _bsas_threshold=1,
+              _AD_engine="occupancy", _AD_downsampling=4,
+              _AD_search_window=None):
+    """
+    Angle detection on one image. Returns the angle detected.
+    
+    _AD_search_window (tuple or None):
+        (center, half width) of the search, see CRAD.CRAD.auto_angle2
+    """
+    print ("Angle Detection process for image", _img_id)
+    _AD = CRAD.CRAD(_img_id,
+                    _path_output_Otsu,
+                    _path_output_Otsu_R,
+                    _path_output_ADp_angle_search_score,
+                    _path_output_ADp_Images)
+    Get_AD_Coord_Map(_AD, _AD_sampling, _AD_sampling_size, _bsas_threshold,
+                     _AD_engine, _AD_downsampling)
+    _AD.auto_angle2(_AD_angle_steps, _search_window = _AD_search_window)
+    if (_save_AD_score_images):
+        _AD.plot_auto_angle_score(_save = True)
+    
+    return _AD.angle_min
+
+def Seed_Images(_nb_images, _AD_seed_sample=None):
+    """
+    Indices of the images on which the full angle search is done: all the
+    images if _AD_seed_sample is None, otherwise _AD_seed_sample images
+    evenly spread over the flight.
+    """
+    if (_AD_seed_sample == None or _AD_seed_sample >= _nb_images):
+        return list(range(_nb_images))
+    return sorted(set(np.linspace(0, _nb_images-1, max(1, _AD_seed_sample)).round().astype(int)))
+
+def BSAS_Worker(_img_id, _path_output_Otsu_R,
+                _path_output_BSAS_txt_R, _path_output_BSAS_images_R,
+                _bsas_threshold=1, _save_BSAS_images=False,
+                _img_array=None, _centroids_format="NPY",
+                _return_centroids=False):
+    """
+    BSAS in both directions on the rotated Otsu mask of one image. The mask
+    is read once for the two directions, or not at all if it is given in
+    _img_array.
+    
+    Returns the centroids of the directions 0 and 1 (see
+    bsas.BSAS_Process.get_centroids_content) if _return_centroids, None
+    otherwise so that they are not kept (or sent back by the worker pool).
+    """
+    print ("BSAS process in directions 0 and 1 for image", _img_id)
+    BSAS_processes = bsas.BSAS_Both_Directions(_path_output_Otsu_R,
+                                               "OTSU_R_"+_img_id,
+                                               _path_output_BSAS_txt_R,
+                                               _bsas_threshold,
+                                               _img_array,
+                                               _centroids_format)
+    if (_save_BSAS_images):
+        for k in range (2):
+            BSAS_processes[k].save_BSASmap(_path_output_BSAS_images_R[k])
+    
+    if (_return_centroids):
+        return [_bsp.get_centroids_content() for _bsp in BSAS_processes]
+
+def Rotation_BSAS_Worker(_img_id, _angle_min,
+                         _path_output_Otsu, _path_output_Otsu_R,
+                         _path_output_BSAS_txt_R, _path_output_BSAS_images_R,
+                         _bsas_threshold=1, _save_BSAS_images=False,
+                         _mask_format="NPY", _save_mask_previews=False,
+                         _centroids_format="NPY", _return_centroids=False):
+    """
+    Rotates the Otsu mask of one image by _angle_min and applies the BSAS
+    in both directions on the rotated mask. Returns what BSAS_Worker
+    returns.
+    """
+    _AD = CRAD.CRAD(_img_id, _path_output_Otsu, _path_output_Otsu_R, None, None)
+    _AD.angle_min = _angle_min
+    _AD.get_auto_angle_rotated_Otsu(_mask_format, _save_mask_previews)
+    
+    return BSAS_Worker(_img_id, _path_output_Otsu_R,
+                       _path_output_BSAS_txt_R, _path_output_BSAS_images_R,
+                       _bsas_threshold, _save_BSAS_images,
+                       _AD.Otsu_img_rot_arr, _centroids_format,
+                       _return_centroids)
+
 def All_Pre_Treatment(_path_input_rgb_img, _path_output_root,
                       _make_unique_folder_per_session=True, _session=1,
                       _do_Otsu=True, _do_AD=True,
                       _save_AD_score_images=False, _save_BSAS_images=False,
-                      _bsas_threshold=1):
+                      _bsas_threshold=1,
+                      _Otsu_pooled_threshold=False,
+                      _mask_format="NPY", _save_mask_previews=False,
+                      _nb_workers=1, _centroids_format="NPY",
+                      _return_centroids=False, _AD_angle_steps=(5, 1),
+                      _AD_sampling=None, _AD_sampling_size=None,
+                      _AD_engine="occupancy", _AD_downsampling=4,
+                      _rotated_mask_format=None,
+                      _AD_seed_sample=None, _AD_window=3,
+                      _AD_vote_resolution=1, _AD_vote_smoothing=0,
+                      _Otsu_tile_size=None):
+    """
+    _return_centroids (bool):
+        If True, the BSAS centroids of every image are returned in a dictionary
+        {image id: [centroids direction 0, centroids direction 1]}. It can be
+        given to FrequencyAnalysis.All_Fourier_Analysis to chain the two
+        stages without reading the bsas files again. The memory used then
+        grows with the number of images; if False, the centroids of an image
+        are only written in the bsas files.
+    """
     
     #Creates new Output folders every time the process is launched
     gIO.check_make_directory(_path_output_root)
@@ -94,11 +354,20 @@ def All_Pre_Treatment(_path_input_rgb_img, _path_output_root,
     gIO.check_make_directory(path_output_Otsu)
     gIO.check_make_directory(path_output_Otsu_R)
     if _do_Otsu:
-        for i in range(nb_images):
-            print()
-            print ("Processing Otsu mask for image", list_images[i], "{0}/{1}".format(i+1, nb_images))
-            image = data.Data(list_images[i], _path_input_rgb_img)
-            image.save("mask_Otsu", "OTSU_"+list_images[i], path = path_output_Otsu)
+        if (_Otsu_pooled_threshold):
+            print("Computing the pooled Otsu threshold of the {0} images".format(nb_images))
+            Otsu_thresholds = batch.Batch_Otsu_Thresholds(list_images,
+                                                          _path_input_rgb_img,
+                                                          pooled = True)
+        else:
+            Otsu_thresholds = [None]*nb_images
+        
+        Map_Workers(Otsu_Worker,
+                    [(list_images[i], _path_input_rgb_img, path_output_Otsu,
+                      Otsu_thresholds[i], _mask_format, _save_mask_previews,
+                      _Otsu_tile_size)
+                     for i in range(nb_images)],
+                    _nb_workers)
     
 # =============================================================================
 # Angle Detection (AD)
@@ -126,9 +395,58 @@ def All_Pre_Treatment(_path_input_rgb_img, _path_output_root,
     path_output_BSAS_txt_R = [path_output_BSAS_txt_R_0, path_output_BSAS_txt_R_1]
     path_output_BSAS_images_R = [path_output_BSAS_images_R_0, path_output_BSAS_images_R_1]
     
-    if _do_AD:
-        AD_object_list = []
-        for i in range(nb_images):
+    rotated_mask_format = _mask_format
+    if (_rotated_mask_format != None):
+        rotated_mask_format = _rotated_mask_format
+    
+    all_centroids = {}
+    if (_do_AD and _nb_workers != 1):
+        #Every image is independent except for the vote on the angle: the
+        #angle detection is distributed on the worker pool, the results are
+        #gathered for the vote and then the rotation and the BSAS are
+        #distributed again.
+        #With the incremental voting, the seed images are searched first and
+        #their vote gives the center of the search window of the others.
+        seeds = Seed_Images(nb_images, _AD_seed_sample)
+        others = [i for i in range(nb_images) if not i in seeds]
+        angles = []
+        search_window = None
+        for _group in (seeds, others):
+            if (len(_group) > 0):
+                angles += Map_Workers(AD_Worker,
+                                      [(list_images_id[i], path_output_Otsu, path_output_Otsu_R,
+                                        path_output_ADp_angle_search_score, path_output_ADp_Images,
+                                        _save_AD_score_images, _AD_angle_steps,
+                                        _AD_sampling, _AD_sampling_size, _bsas_threshold,
+                                        _AD_engine, _AD_downsampling, search_window)
+                                       for i in _group],
+                                      _nb_workers)
+                search_window = (CRAD.Vote_Best_Angle(angles, _AD_vote_resolution,
+                                                      _AD_vote_smoothing)[0], _AD_window)
+        
+        best_angle_min = CRAD.Vote_Best_Angle(angles, _AD_vote_resolution,
+                                              _AD_vote_smoothing)[0]
+        print("The best angle seems to be:", best_angle_min)
+        
+        centroids = Map_Workers(Rotation_BSAS_Worker,
+                                [(list_images_id[i], best_angle_min,
+                                  path_output_Otsu, path_output_Otsu_R,
+                                  path_output_BSAS_txt_R, path_output_BSAS_images_R,
+                                  _bsas_threshold, _save_BSAS_images,
+                                  rotated_mask_format, _save_mask_previews,
+                                  _centroids_format, _return_centroids)
+                                 for i in range(nb_images)],
+                                _nb_workers)
+        if (_return_centroids):
+            all_centroids = dict(zip(list_images_id, centroids))
+    
+    elif _do_AD:
+        AD_object_list = [None]*nb_images
+        #With the incremental voting, the seed images are searched first and
+        #the others only search around the angle voted so far.
+        seeds = Seed_Images(nb_images, _AD_seed_sample)
+        angles = []
+        for i in seeds + [i for i in range(nb_images) if not i in seeds]:
             print()
             print ("Angle Detection process for image", list_images[i], "{0}/{1}".format(i+1, nb_images))
             
@@ -139,17 +457,24 @@ def All_Pre_Treatment(_path_input_rgb_img, _path_output_root,
                            path_output_ADp_angle_search_score,
                            path_output_ADp_Images)
             
-            AD_object_list.append(_AD)
+            AD_object_list[i] = _AD
             
-            _AD.get_coord_map()
+            Get_AD_Coord_Map(_AD, _AD_sampling, _AD_sampling_size, _bsas_threshold,
+                             _AD_engine, _AD_downsampling)
             
-            _AD.auto_angle2()
+            search_window = None
+            if (len(angles) >= len(seeds)):
+                search_window = (CRAD.Vote_Best_Angle(angles, _AD_vote_resolution,
+                                                      _AD_vote_smoothing)[0], _AD_window)
+            _AD.auto_angle2(_AD_angle_steps, _search_window = search_window)
+            angles.append(_AD.angle_min)
             
             if (_save_AD_score_images):
                 _AD.plot_auto_angle_score(_save = True)
         
         
-        AD_voting = CRAD.CRAD_Voting(AD_object_list)
+        AD_voting = CRAD.CRAD_Voting(AD_object_list, _AD_vote_resolution,
+                                     _AD_vote_smoothing)
         AD_voting.Get_Best_Angle()
         print("The best angle seems to be:", AD_voting.best_angle_min)
         AD_voting.Correct_AD_based_on_best_angle()
@@ -157,20 +482,22 @@ def All_Pre_Treatment(_path_input_rgb_img, _path_output_root,
         i=0
         for _AD in AD_voting.AD_objects_List:
     
-            _AD.get_auto_angle_rotated_Otsu()
+            _AD.get_auto_angle_rotated_Otsu(rotated_mask_format, _save_mask_previews)
             
             print()
             
-            for k in range (2):
-                print ("BSAS process in direction", k,
-                       "for image", list_images[i], "{0}/{1}".format(i+1, nb_images))
-                bsp1 = bsas.BSAS_Process(path_output_Otsu_R,
-                                         "OTSU_R_"+list_images_id[i]+".jpg",
-                                         path_output_BSAS_txt_R[k])
-                bsp1.full_process(k, False, _bsas_threshold)
-                if (_save_BSAS_images):
-                    bsp1.save_BSASmap(path_output_BSAS_images_R[k])
+            centroids = BSAS_Worker(
+                        list_images_id[i], path_output_Otsu_R,
+                        path_output_BSAS_txt_R, path_output_BSAS_images_R,
+                        _bsas_threshold, _save_BSAS_images,
+                        _AD.Otsu_img_rot_arr, _centroids_format,
+                        _return_centroids)
+            if (_return_centroids):
+                all_centroids[list_images_id[i]] = centroids
             i+=1
+    
+    if (_return_centroids):
+        return all_centroids
 
 if (__name__=="__main__"):
     
@@ -179,4 +506,14 @@ if (__name__=="__main__"):
                       _make_unique_folder_per_session=True, _session=1,
                       _do_Otsu=True, _do_AD=True,
                       _save_AD_score_images=False, _save_BSAS_images=False,
-                      _bsas_threshold=1)
+                      _bsas_threshold=1,
+                      _Otsu_pooled_threshold=False,
+                      _mask_format="NPY", _save_mask_previews=False,
+                      _nb_workers=1, _centroids_format="NPY",
+                      _AD_angle_steps=(5, 1),
+                      _AD_sampling=None, _AD_sampling_size=None,
+                      _AD_engine="occupancy", _AD_downsampling=4,
+                      _rotated_mask_format=None,
+                      _AD_seed_sample=None, _AD_window=3,
+                      _AD_vote_resolution=1, _AD_vote_smoothing=0,
+                      _Otsu_tile_size=None)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Traitement par lot de la segmentation Otsu sur un ensemble d'images.
+
+Les images d'un même vol partagent les mêmes conditions d'acquisition: plutôt
+que de chercher un seuil d'Otsu par image, on peut calculer les histogrammes
+ExG de toutes les images en parallèle puis:
+    - soit chercher un seuil par image (mode par image)
+    - soit chercher un seul seuil sur l'histogramme cumulé de toutes les images
+    (mode "pooled"), ce qui donne des masques cohérents d'une image à l'autre
+    et une seule recherche de seuil pour tout le vol.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import otsu as o
+import data
+
+
+def ExG_Histogram(name, path_images, th_black=10):
+    """
+    Calcule l'histogramme (voir otsu.Hist_np) de l'image ExG d'une image RGB.
+    """
+    image = data.Data(name, path_images)
+    return o.Hist_np(image.convertir_ExG(), th_black)
+
+
+def Batch_Histograms(names, path_images, th_black=10, nb_workers=None):
+    """
+    Calcule en parallèle les histogrammes ExG de toutes les images de names.
+    Le calcul de l'ExG et de l'histogramme est fait par numpy, qui libère le
+    GIL: un pool de threads suffit.
+
+    nb_workers (int, optional): nombre de threads, par défaut le nombre de
+    coeurs de la machine.
+
+    Retourne un tableau de taille (nb_images, 256).
+    """
+    with ThreadPoolExecutor(max_workers=nb_workers) as executor:
+        histograms = list(executor.map(lambda _n: ExG_Histogram(_n, path_images, th_black),
+                                       names))
+    return np.array(histograms)
+
+
+def Batch_Otsu_Thresholds(names, path_images, th_black=10,
+                          pooled=False, nb_workers=None):
+    """
+    Calcule les seuils d'Otsu de toutes les images de names.
+
+    pooled (bool): si True, un seul seuil est calculé sur l'histogramme cumulé
+    de toutes les images et il est appliqué à chacune d'elles. Si False, chaque
+    image a son propre seuil.
+
+    Retourne la liste des seuils, dans l'ordre de names.
+    """
+    histograms = Batch_Histograms(names, path_images, th_black, nb_workers)
+
+    if pooled:
+        lambda_values = o.threshold_np(np.sum(histograms, axis=0), th_black)
+        return [o.get_optimal_threshold_np(lambda_values)]*len(names)
+
+    return [o.get_optimal_threshold_np(o.threshold_np(_h, th_black))
+            for _h in histograms]
@@ -14,6 +14,9 @@ from skimage.util import random_noise
 path_scripts = os.path.dirname(os.path.abspath(__file__))
 os.chdir(path_scripts)
 import otsu as o
+os.chdir("../Utility")
+import mask_IO
+os.chdir(path_scripts)
 
 
 import numpy as np 
@@ -22,6 +25,63 @@ import cv2
 from PIL import Image, ImageFilter
 
 
+def ExG_int16(image_array, out=None):
+    """
+    Calcule l'ExG (2*G - R - B) d'une image RGB uint8 en int16, sans passer
+    par des tableaux int64/float64 intermédiaires. Les valeurs sont dans
+    [-510, 510].
+    """
+    if out is None:
+        out = np.empty(image_array.shape[:2], dtype=np.int16)
+    np.multiply(image_array[...,1], 2, out=out, dtype=np.int16)
+    np.subtract(out, image_array[...,0], out=out)
+    np.subtract(out, image_array[...,2], out=out)
+    return out
+
+
+def ExG_mask(image_array, image_ExG=None, nb_std=2, chunk_rows=512):
+    """
+    Noyau fusionné ExG + seuillage: construit le masque 0/255 (uint8) des
+    pixels tels que ExG >= moy(ExG) + nb_std*std(ExG).
+    
+    L'image est parcourue par bandes de chunk_rows lignes: l'ExG de chaque bande
+    est calculée en int16 (si image_ExG n'est pas fourni) et les sommes des
+    valeurs et de leurs carrés sont accumulées en entiers, ce qui donne la
+    moyenne et l'écart-type en une seule passe. Une seconde passe applique le
+    seuil directement dans le masque uint8.
+    
+    Retourne (image_ExG, mask).
+    """
+    lines = image_array.shape[0]
+    if image_ExG is None:
+        image_ExG = np.empty(image_array.shape[:2], dtype=np.int16)
+        compute_ExG = True
+    else:
+        compute_ExG = False
+    
+    total = 0
+    total_sq = 0
+    for _start in range(0, lines, chunk_rows):
+        chunk = image_ExG[_start:_start+chunk_rows]
+        if compute_ExG:
+            ExG_int16(image_array[_start:_start+chunk_rows], out=chunk)
+        total += int(np.sum(chunk, dtype=np.int64))
+        total_sq += int(np.sum(np.square(chunk, dtype=np.int32), dtype=np.int64))
+    
+    nb_pixels = image_ExG.size
+    mean = total/nb_pixels
+    std = np.sqrt(max(total_sq/nb_pixels - mean**2, 0))
+    seuil_min = mean + nb_std*std
+    
+    mask = np.empty(image_ExG.shape, dtype=np.uint8)
+    for _start in range(0, lines, chunk_rows):
+        np.greater_equal(image_ExG[_start:_start+chunk_rows], seuil_min,
+                         out=mask[_start:_start+chunk_rows].view(bool))
+    mask *= 255
+    
+    return image_ExG, mask
+
+
 class Data:
     '''
     Classe avec l'ensemble des données chargées
@@ -52,14 +112,17 @@ class Data:
         
         self.path_images = path_images
         self.name = name
-        self.image_PIL=Image.open(os.path.join(self.path_images,self.name))
+        
+        #l'image est décodée une seule fois dans un unique buffer RGB uint8.
+        #Les images grayscale, HSV et ExG en sont dérivées à la demande puis
+        #gardées en cache (voir les propriétés image_gray, image_HSV, image_ExG)
+        image_PIL = Image.open(os.path.join(self.path_images,self.name)).convert("RGB")
         if (_apply_blur):
-            self.image_PIL = self.image_PIL.filter(ImageFilter.GaussianBlur(radius = _blur_radius))
-        self.image_array =  np.array(self.image_PIL)
+            image_PIL = image_PIL.filter(ImageFilter.GaussianBlur(radius = _blur_radius))
+        self.image_array = np.asarray(image_PIL)
         if (_img_array_restrictions != None):
             self.image_array = self.image_array[self.image_array.shape[0]-_img_array_restrictions[0]:,
                                                 :_img_array_restrictions[1]]
-        self.image_gray = np.array(self.image_PIL.convert('L'))
         
         #plt.imshow(self.image_array)
         
@@ -67,6 +130,24 @@ class Data:
         self.noise_type = _noise_type
         self.noise_var = _noise_var
     
+    @property
+    def image_gray(self):
+        if not hasattr(self, "_image_gray"):
+            self._image_gray = self.convertir_gray()
+        return self._image_gray
+    
+    @property
+    def image_HSV(self):
+        if not hasattr(self, "_image_HSV"):
+            self._image_HSV = self.convertir_HSV()
+        return self._image_HSV
+    
+    @property
+    def image_ExG(self):
+        if not hasattr(self, "_image_ExG"):
+            self._image_ExG = self.convertir_ExG()
+        return self._image_ExG
+    
     def apply_noise(self, _img_arr):
         noise_arr = random_noise(_img_arr,
                                  mode=self.noise_type,
@@ -78,13 +159,20 @@ class Data:
         return np.array(255*noise_arr, dtype = 'uint8')
                       
 
+    def convertir_gray(self):
+        """
+        retourne l'image en niveaux de gris, avec la même formule entière que
+        la conversion "L" de PIL (L = R*299/1000 + G*587/1000 + B*114/1000)
+        """
+        image = self.image_array.astype(np.uint32)
+        image = (image[...,0]*19595 + image[...,1]*38470 + image[...,2]*7471 + 0x8000) >> 16
+        return image.astype(np.uint8)
+    
     def convertir_ExG(self):
         '''
         convertis image en ExG
         '''
-        image = self.image_array
-            
-        image = np.dot(image[...,:3], [-1, 2, -1])
+        image = ExG_int16(self.image_array)
         
         if (self._apply_noise):
             image = np.array(255*((image+abs(np.min(image)))/(np.max(image+abs(np.min(image))))), dtype = 'uint8')
@@ -99,23 +187,18 @@ class Data:
         créer le mask : filtre valeur tel que ExG > (moy(ExG) + 2*std(ExG)) 
         '''
         # masque de detection du vert
-        self.image_ExG = self.convertir_ExG()
-        
-        seuil_min = np.mean(self.image_ExG) + 2*np.std(self.image_ExG)
-        mask=np.zeros(self.image_ExG.shape)
-        mask = np.where(self.image_ExG<seuil_min, mask, 255)
-        self.mask_ExG = mask
+        # l'ExG est calculée en même temps que le masque si elle n'est pas déjà en cache
+        if (self._apply_noise or hasattr(self, "_image_ExG")):
+            self._image_ExG, self.mask_ExG = ExG_mask(self.image_array, self.image_ExG)
+        else:
+            self._image_ExG, self.mask_ExG = ExG_mask(self.image_array)
     
       
     def convertir_HSV(self):
         """
-        retourne l'image en HSV
+        retourne l'image en HSV, calculée à partir du buffer RGB déjà décodé
         """
-        #lecture image avec cv2 (image en BGR par défaut)
-        image = cv2.imread(os.path.join(self.path_images,self.name))
-        #conversion image en RGB
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        return image
+        return cv2.cvtColor(self.image_array, cv2.COLOR_RGB2HSV)
 
 
     def create_maskHSV(self, sensibilite=20):
@@ -123,7 +206,6 @@ class Data:
         cree un masque HSV en valeur 0/255
         """
         # masque de detection du vert
-        self.image_HSV = self.convertir_HSV()
         lower_green = np.array([60 - sensibilite, 0, 0]) 
         upper_green = np.array([60 + sensibilite, 255, 255])
         mask = cv2.inRange(self.image_HSV, lower_green , upper_green)
@@ -132,17 +214,24 @@ class Data:
 
         
         
-    def create_maskOtsu(self, start_threshold=10):
+    def create_maskOtsu(self, start_threshold=10, th_crops=None):
         """
         cree un masque avec la méthode Otsu en 0/255
+        
+        th_crops (int, optional): seuil d'Otsu déjà connu (par exemple calculé
+        sur tout un lot d'images avec batch.Batch_Otsu_Thresholds). Si None, le
+        seuil est recherché sur l'image.
         """
         
         if not hasattr(self, "mask_ExG"):
             self.create_maskExG()
 
-        self.mask_Otsu = o.segmentation_otsu(self.image_ExG, start_threshold)
-        #conversion en noir et blanc :
-        self.mask_Otsu=np.where(self.mask_Otsu<=200, 0, 255)
+        if (th_crops == None):
+            self.mask_Otsu = o.segmentation_otsu(self.image_ExG, start_threshold)
+        else:
+            self.mask_Otsu = o.segmentation_img(self.image_ExG, start_threshold, th_crops)
+        #conversion en noir et blanc (en place, le masque reste en uint8) :
+        self.mask_Otsu[self.mask_Otsu<=200] = 0
     
        
     def create_maskfusion(self):
@@ -155,10 +244,8 @@ class Data:
         if not hasattr(self, "mask_HSV"):
             self.create_maskHSV()
         
-        #faire une map des points égaux à 255
-        self.mask_fusion=self.mask_ExG+self.mask_HSV+self.mask_Otsu
-        self.mask_fusion=np.where(self.mask_fusion==255*3, self.mask_fusion, 0)
-        self.mask_fusion=(self.mask_fusion/3).astype(int)
+        #faire une map des points égaux à 255 (les masques sont en uint8 0/255)
+        self.mask_fusion=self.mask_ExG & self.mask_HSV & self.mask_Otsu
         
     def create_maskunion(self):
         """
@@ -170,10 +257,8 @@ class Data:
         if not hasattr(self, "mask_HSV"):
             self.create_maskHSV()
             
-        #faire une map des points égaux à 255
-        self.mask_union=self.mask_ExG+self.mask_HSV+self.mask_Otsu
-        self.mask_union=np.where(self.mask_union>=255, self.mask_union, 0)
-        self.mask_union=np.where(self.mask_union==0, self.mask_union, 255).astype(int)
+        #faire une map des points égaux à 255 (les masques sont en uint8 0/255)
+        self.mask_union=self.mask_ExG | self.mask_HSV | self.mask_Otsu
 
 
     def display(self, object_name, *args):
@@ -205,13 +290,16 @@ class Data:
         plt.imshow(getattr(self, object_name))
         
         
-    def save(self,object_name,file_name,*args,path=None):
+    def save(self,object_name,file_name,*args,path=None,file_format="JPEG"):
         """
         ATTENTION : Si path est utilisé, il doit être spécifié dans la commande comme path="qqch" !
         
         
         object_name : mask_ExG, mask_HSV, mask_Otsu, mask_fusion, mask_union
         
+        file_format : "JPEG" (aperçu, avec pertes), ou "NPY" / "PNG" (sans perte,
+        à utiliser pour les masques lus par les étapes suivantes, voir mask_IO)
+        
         A partir du nom de l'objet à display, l'affiche. Si l'objet n'existe pas, le créée avec les éventuels
         arguments *args
         """
@@ -222,13 +310,18 @@ class Data:
         if not hasattr(self, object_name):
             indice=indices.index(object_name)
             fonctions[indice](*args)            
-        _to_save=Image.fromarray(getattr(self, object_name)).convert("RGB")
         
         #Si un chemin est spécifié, on le joint au nom de l'image
         if path!=None:
             name=file_name.split(".")[0]
             file_name=os.path.join(path, name)
         
+        if file_format!="JPEG":
+            mask_IO.save_mask(*os.path.split(file_name), getattr(self, object_name), file_format)
+            return
+        
+        _to_save=Image.fromarray(getattr(self, object_name)).convert("RGB")
+        
         #Si le nom donné pour file_name ne finit pas par .jpg, on l'ajoute
         if file_name[-3:]!=".jpg":
             file_name=file_name+".jpg"
@@ -141,7 +141,20 @@ def get_optimal_threshold(lambda_results):
     return optimal_threshold[0]
 
 
-def segmentation_img(img, th_black, th_crops):
+def segmentation_lut(th_black, th_crops, first_level=0):
+    """
+    Construit la table de correspondance (uint8) utilisée par segmentation_img
+    pour les niveaux allant de first_level à 255: 0 pour les niveaux <=th_black,
+    150 entre th_black et th_crops, 255 pour les niveaux >=th_crops.
+    """
+    levels = np.arange(first_level, 256)
+    lut = np.zeros(levels.size, dtype=np.uint8)
+    lut[levels > th_black] = 150 #les mauvaises herbes apparaissent en gris
+    lut[(levels > th_black) & (levels >= th_crops)] = 255
+    return lut
+
+
+def segmentation_img(img, th_black, th_crops, out=None):
     """
     Cette fonction segmente l'image:
         - ce qui est supérieur au seuil th_crops apparaît en blanc
@@ -150,22 +163,107 @@ def segmentation_img(img, th_black, th_crops):
     Arguments:
         - th_black: seuil séparant le sol, fixé au départ
         - th_crops: seuil obtenu via la méthode d'Otsu
+        - out: tableau uint8 de même forme que img dans lequel écrire le
+        résultat (optionnel, un nouveau tableau est créé sinon)
+    La segmentation est faite en un seul appel par table de correspondance;
+    les valeurs hors de la table (possibles avec l'ExG) sont ramenées à ses
+    bornes, ce qui ne change pas leur classe.
     """
-    row, col = img.shape
+    first_level = min(0, th_black)
+    lut = segmentation_lut(th_black, th_crops, first_level)
+    if first_level != 0:
+        img = np.asarray(img, dtype=np.int32) - first_level
+    if out is None:
+        out = np.empty(np.shape(img), dtype=np.uint8)
+    return np.take(lut, img, out=out, mode='clip')
 
-    y = np.zeros((row, col))
-    for i in range(0,row):
-        for j in range(0,col):
-            if img[i,j]>th_black:
-                if img[i,j] >= th_crops:
-                    y[i,j] = 255
-                else:
-                    y[i,j] = 150 #les mauvaises herbes apparaissent en gris
-            else: #ce qui est inférieur à th_black est mis en noir
-                y[i,j] = 0
-    return y
 
-def segmentation_otsu(img, th_black):
+def Hist_np(img, th_black):
+    """
+    Version vectorisée de Hist: l'histogramme est construit en un seul appel
+    à np.bincount au lieu d'une double boucle sur les pixels.
+    Comme dans Hist, seuls les pixels de valeur>th_black sont comptés. Les
+    valeurs supérieures à 255 (possibles avec l'ExG) sont ramenées dans la
+    dernière classe de l'histogramme.
+    """
+    values = np.ravel(img)
+    values = values[values > th_black]
+    if (values.size > 0 and (values.min() < 0 or values.max() > 255)):
+        values = np.clip(values, 0, 255)
+    return np.bincount(values.astype(np.intp), minlength=256).astype(float)
+
+
+def threshold_np(h, th_black):
+    """
+    Version vectorisée de threshold: tous les seuils possibles sont évalués en
+    une seule passe grâce aux sommes cumulées de l'histogramme (poids, moments
+    d'ordre 1 et 2), au lieu de recalculer weight, mean et variance pour chaque
+    seuil.
+    Retourne un tableau lambda_values de même taille que h, où lambda_values[i]
+    est le critère lambda du seuil i (nan pour les seuils non évalués ou
+    indéfinis, comme les seuils absents du dictionnaire de threshold).
+    """
+    h = np.asarray(h, dtype=float)
+    levels = np.arange(h.size, dtype=float)
+
+    #sommes cumulées: w_cum[i], m_cum[i] et s_cum[i] décrivent le sous-histogramme
+    #allant de 0 à i exclu (ie le background pour le seuil i)
+    w_cum = np.concatenate(([0.], np.cumsum(h)))[:-1]
+    m_cum = np.concatenate(([0.], np.cumsum(h * levels)))[:-1]
+    s_cum = np.concatenate(([0.], np.cumsum(h * levels**2)))[:-1]
+    cnt = h.sum()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # (1) background: de 0 à i
+        wb = w_cum
+        mb = m_cum / wb
+        vb = s_cum / wb - mb**2
+
+        # (2) foreground: de i à la fin de l'histogramme
+        wf = cnt - w_cum
+        mf = (m_cum[-1] + h[-1]*levels[-1] - m_cum) / wf
+        vf = (s_cum[-1] + h[-1]*levels[-1]**2 - s_cum) / wf - mf**2
+
+        #les erreurs d'arrondi des sommes cumulées peuvent rendre une variance
+        #nulle très légèrement négative
+        vb = np.maximum(vb, 0.)
+        vf = np.maximum(vf, 0.)
+
+        variance_intra = (wb * vb + wf * vf) / cnt
+        variance_inter = (wb / cnt) * (wf / cnt) * (mb - mf)**2
+        lambda_values = variance_inter / variance_intra
+
+    lambda_values[:th_black + 1] = np.nan
+
+    return lambda_values
+
+
+def get_optimal_threshold_np(lambda_values):
+    """
+    Retourne le seuil de segmentation maximisant le critère lambda à partir du
+    tableau calculé par threshold_np
+    """
+    valid = ~np.isnan(lambda_values)
+    if not valid.any():
+        raise ValueError("No valid threshold could be evaluated on the histogram.")
+
+    optimal_threshold = int(np.argmax(np.where(valid, lambda_values, -np.inf)))
+    print ('optimal threshold: ', optimal_threshold)
+
+    return optimal_threshold
+
+
+def otsu_threshold(img, th_black):
+    """
+    Calcule le seuil d'Otsu d'une image en GRAYSCALE (ou ExG) avec la version
+    vectorisée de l'histogramme et de la recherche du seuil.
+    """
+    h = Hist_np(img, th_black)
+    lambda_values = threshold_np(h, th_black)
+    return get_optimal_threshold_np(lambda_values)
+
+
+def segmentation_otsu(img, th_black, out=None):
     """
     Cette fonction applique une segmentation Otsu à une image en GRAYSCALE. Pour que la segmentation permette
     de séparer tournesols et adventices, il faut de préférence que l'image grayscale soit obtenue après transformation ExG
@@ -174,12 +272,10 @@ def segmentation_otsu(img, th_black):
      - th_black: seuil à partir duquel on considère les pixels
      ex: si th_black = 38, on ne considère donc pas les pixels ayant des niveaux de gris entre
      0 et 38 (ie pixels noirs ou gris foncé)
+     - out: tableau uint8 optionnel recevant l'image segmentée (voir segmentation_img)
     """
-    h = Hist(img, th_black)
-
-    lambda_results = threshold(h, th_black)
-    seuil_optimal = get_optimal_threshold(lambda_results)
+    seuil_optimal = otsu_threshold(img, th_black)
 
-    res = segmentation_img(img, th_black, seuil_optimal) #on segmente l'image avec le seuil optimal trouvé
+    res = segmentation_img(img, th_black, seuil_optimal, out) #on segmente l'image avec le seuil optimal trouvé
 
     return res
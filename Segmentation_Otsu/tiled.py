@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Segmentation par tuiles des images trop grandes pour être chargées en mémoire
+(orthomosaïques de parcelles entières).
+
+L'image source est lue par fenêtres (tuiles) avec un recouvrement optionnel,
+utile quand un flou est appliqué, pour éviter les effets de bord. Le calcul se
+fait en deux passes:
+    - une première passe calcule les statistiques globales de l'ExG (moyenne,
+    écart-type et histogramme). On en déduit le seuil du masque ExG et un seuil
+    d'Otsu unique pour toute l'image.
+    - une seconde passe calcule les masques ExG, HSV et Otsu de chaque tuile
+    avec ces seuils globaux et les écrit au fur et à mesure dans des fichiers
+    .npy ouverts en memory-map.
+
+Lecture de la source: un fichier .npy (tableau RGB uint8 de forme (h, w, 3))
+est ouvert en memory-map et seule la fenêtre de chaque tuile est lue. Les
+autres formats sont d'abord recopiés dans un fichier .npy fenêtre par fenêtre
+(voir Convert_To_Npy): les fenêtres sont les tuiles de décodage de PIL (TIFF
+tuilés ou en bandes) et les images non compressées (TIFF brut...) sont lues
+par bandes de lignes. Une image compressée d'un seul bloc (JPEG, PNG, TIFF
+compressé sans tuiles) doit en revanche être décodée entièrement.
+"""
+
+import os
+
+import numpy as np
+import cv2
+from PIL import Image, ImageFilter
+
+import otsu as o
+import data
+
+
+#nombre d'octets par pixel des modes bruts (codec "raw" de PIL) qui peuvent
+#être lus par bandes de lignes
+RAW_MODES_BYTES = {"L": 1, "RGB": 3, "RGBA": 4, "RGBX": 4}
+
+
+def open_image(path_source):
+    """
+    Ouvre path_source avec PIL sans le décoder. La protection de PIL contre les
+    images trop grandes n'est levée que le temps de l'ouverture.
+    """
+    max_image_pixels = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        return Image.open(path_source)
+    finally:
+        Image.MAX_IMAGE_PIXELS = max_image_pixels
+
+
+def is_raw_window(window):
+    """
+    Vrai si la fenêtre de décodage window est un bloc brut (codec "raw" de PIL,
+    lignes de haut en bas) qui peut être lu directement dans le fichier.
+    """
+    args = window.args if isinstance(window.args, tuple) else (window.args,)
+    return (window.codec_name == "raw" and args[0] in RAW_MODES_BYTES and
+            (len(args) < 3 or args[2] == 1))
+
+
+def decoding_windows(image, max_lines=256):
+    """
+    Découpe les tuiles de décodage de l'image PIL image (image.tile) en
+    fenêtres qui peuvent être décodées séparément. Une tuile brute (voir
+    is_raw_window) est découpée en bandes d'au plus max_lines lignes en
+    décalant sa position dans le fichier; les autres tuiles sont gardées
+    entières.
+    """
+    windows = []
+    for _tile in image.tile:
+        if (not is_raw_window(_tile)):
+            windows.append(_tile)
+            continue
+
+        x0, y0, x1, y1 = _tile.extents
+        args = _tile.args if isinstance(_tile.args, tuple) else (_tile.args,)
+        stride = args[1] if len(args) > 1 and args[1] else (x1-x0)*RAW_MODES_BYTES[args[0]]
+        for _y in range(y0, y1, max_lines):
+            windows.append(_tile._replace(extents = (x0, _y, x1, min(_y + max_lines, y1)),
+                                          offset = _tile.offset + (_y-y0)*stride,
+                                          args = (args[0], stride, 1)))
+    return windows
+
+
+def read_window(path_source, window):
+    """
+    Décode la fenêtre window (voir decoding_windows) de l'image path_source et
+    retourne son tableau RGB uint8. Un bloc brut est lu directement dans le
+    fichier; les autres blocs sont décodés par PIL, sur une image réduite à la
+    fenêtre.
+    """
+    x0, y0, x1, y1 = window.extents
+    if (is_raw_window(window)):
+        raw_mode, stride = window.args[:2]
+        nb_bytes = RAW_MODES_BYTES[raw_mode]
+        block = np.fromfile(path_source, dtype=np.uint8, count=stride*(y1-y0),
+                            offset=window.offset).reshape(y1-y0, stride)
+        block = block[:, :(x1-x0)*nb_bytes].reshape(y1-y0, x1-x0, nb_bytes)
+        if (nb_bytes == 1):
+            return np.repeat(block, 3, axis=2)
+        return block[..., :3]
+
+    part = open_image(path_source)
+    part._size = (x1-x0, y1-y0)
+    part.tile = [window._replace(extents = (0, 0, x1-x0, y1-y0))]
+    block = np.asarray(part.convert("RGB"))
+    part.close()
+    return block
+
+
+def Convert_To_Npy(path_source, path_npy, max_lines=256):
+    """
+    Recopie l'image path_source dans le fichier path_npy (tableau RGB uint8 de
+    forme (h, w, 3)) fenêtre par fenêtre (voir decoding_windows): seule une
+    fenêtre est décodée à la fois. Une image compressée d'un seul bloc est
+    décodée entièrement.
+
+    Retourne le tableau path_npy ouvert en memory-map.
+    """
+    image = open_image(path_source)
+    columns, lines = image.size
+    windows = decoding_windows(image, max_lines)
+    image.close()
+
+    output = np.lib.format.open_memmap(path_npy, mode="w+", dtype=np.uint8,
+                                       shape=(lines, columns, 3))
+    for _window in windows:
+        x0, y0, x1, y1 = _window.extents
+        output[y0:y1, x0:x1] = read_window(path_source, _window)
+    output.flush()
+    del output
+
+    return np.load(path_npy, mmap_mode='r')
+
+
+def open_source(path_source, path_npy=None):
+    """
+    Ouvre l'image source et retourne un tableau RGB uint8 de forme (h, w, 3)
+    qui peut être découpé en fenêtres.
+    Un fichier .npy est ouvert en memory-map. Les autres formats sont recopiés
+    dans path_npy par Convert_To_Npy si path_npy est donné, et décodés
+    entièrement en mémoire sinon.
+    """
+    if (path_source.endswith(".npy")):
+        return np.load(path_source, mmap_mode='r')
+
+    if (path_npy != None):
+        return Convert_To_Npy(path_source, path_npy)
+
+    return np.asarray(open_image(path_source).convert("RGB"))
+
+
+def iter_tiles(source, tile_size=2048, overlap=0, blur_radius=None):
+    """
+    Parcourt l'image source par tuiles de tile_size x tile_size pixels.
+    Chaque tuile est lue avec overlap pixels de recouvrement de chaque côté,
+    floutée si blur_radius est donné, puis recadrée sur sa zone utile.
+
+    Retourne pour chaque tuile (y0, y1, x0, x1, tile) où tile est le tableau
+    RGB de la zone [y0:y1, x0:x1] de l'image.
+    """
+    lines, columns = source.shape[:2]
+    for y0 in range(0, lines, tile_size):
+        y1 = min(y0 + tile_size, lines)
+        for x0 in range(0, columns, tile_size):
+            x1 = min(x0 + tile_size, columns)
+
+            wy0, wy1 = max(y0 - overlap, 0), min(y1 + overlap, lines)
+            wx0, wx1 = max(x0 - overlap, 0), min(x1 + overlap, columns)
+            tile = np.asarray(source[wy0:wy1, wx0:wx1, :3])
+
+            if (blur_radius != None):
+                tile = np.asarray(Image.fromarray(tile).filter(
+                                    ImageFilter.GaussianBlur(radius = blur_radius)))
+
+            yield y0, y1, x0, x1, tile[y0-wy0:y1-wy0, x0-wx0:x1-wx0]
+
+
+def Global_ExG_Statistics(source, start_threshold=10,
+                          tile_size=2048, overlap=0, blur_radius=None):
+    """
+    Première passe: calcule en une lecture de l'image la moyenne et
+    l'écart-type de l'ExG ainsi que l'histogramme utilisé pour le seuil d'Otsu.
+
+    Retourne (mean, std, histogram).
+    """
+    total = 0
+    total_sq = 0
+    nb_pixels = 0
+    histogram = np.zeros(256)
+    for _y0, _y1, _x0, _x1, _tile in iter_tiles(source, tile_size, overlap, blur_radius):
+        tile_ExG = data.ExG_int16(_tile)
+        total += int(np.sum(tile_ExG, dtype=np.int64))
+        total_sq += int(np.sum(np.square(tile_ExG, dtype=np.int32), dtype=np.int64))
+        nb_pixels += tile_ExG.size
+        histogram += o.Hist_np(tile_ExG, start_threshold)
+
+    mean = total/nb_pixels
+    std = np.sqrt(max(total_sq/nb_pixels - mean**2, 0))
+
+    return mean, std, histogram
+
+
+def Tiled_Segmentation(path_source, path_output, name,
+                       masks=("ExG", "HSV", "Otsu"),
+                       start_threshold=10, sensibilite=20,
+                       tile_size=2048, overlap=0, blur_radius=None,
+                       th_crops=None, file_names=None, path_source_npy=None):
+    """
+    Segmente l'image path_source par tuiles et écrit les masques demandés
+    (parmi "ExG", "HSV" et "Otsu") dans path_output, sous la forme de fichiers
+    .npy uint8 0/255 nommés <name>_mask_<masque>.npy.
+
+    Les seuils sont globaux: ExG >= moy(ExG) + 2*std(ExG) pour le masque ExG,
+    et un seuil d'Otsu calculé sur l'histogramme de toute l'image pour le
+    masque Otsu. Ils sont identiques à ceux de data.Data pour une image qui
+    tiendrait en mémoire.
+
+    Une source qui n'est pas un fichier .npy est d'abord recopiée fenêtre par
+    fenêtre dans un fichier .npy (voir Convert_To_Npy): path_source_npy, ou à
+    défaut un fichier temporaire de path_output supprimé à la fin.
+
+    th_crops (int, optional): seuil d'Otsu déjà connu. Si None, il est calculé
+    sur l'histogramme de toute l'image.
+
+    file_names (dict, optional): noms des fichiers de certains masques
+    {masque: nom du fichier .npy}, à la place de <name>_mask_<masque>.npy.
+
+    Retourne le dictionnaire {masque: chemin du fichier .npy}.
+    """
+    path_temporary_npy = None
+    if (path_source_npy == None and not path_source.endswith(".npy")):
+        path_temporary_npy = os.path.join(path_output, name+"_source_tmp.npy")
+        path_source_npy = path_temporary_npy
+    source = open_source(path_source, path_source_npy)
+    lines, columns = source.shape[:2]
+
+    mean, std, histogram = Global_ExG_Statistics(source, start_threshold,
+                                                 tile_size, overlap, blur_radius)
+    seuil_ExG = mean + 2*std
+    if (th_crops == None):
+        th_crops = o.get_optimal_threshold_np(o.threshold_np(histogram, start_threshold))
+
+    lower_green = np.array([60 - sensibilite, 0, 0])
+    upper_green = np.array([60 + sensibilite, 255, 255])
+
+    outputs = {}
+    paths = {}
+    for _mask in masks:
+        if (file_names != None and _mask in file_names):
+            paths[_mask] = os.path.join(path_output, file_names[_mask])
+        else:
+            paths[_mask] = os.path.join(path_output, name+"_mask_"+_mask+".npy")
+        outputs[_mask] = np.lib.format.open_memmap(paths[_mask], mode="w+",
+                                                   dtype=np.uint8,
+                                                   shape=(lines, columns))
+
+    for _y0, _y1, _x0, _x1, _tile in iter_tiles(source, tile_size, overlap, blur_radius):
+        tile_ExG = data.ExG_int16(_tile)
+
+        if ("ExG" in outputs):
+            outputs["ExG"][_y0:_y1, _x0:_x1] = np.where(tile_ExG < seuil_ExG, 0, 255)
+
+        if ("HSV" in outputs):
+            outputs["HSV"][_y0:_y1, _x0:_x1] = cv2.inRange(cv2.cvtColor(_tile, cv2.COLOR_RGB2HSV),
+                                                           lower_green, upper_green)
+
+        if ("Otsu" in outputs):
+            out = outputs["Otsu"][_y0:_y1, _x0:_x1]
+            o.segmentation_img(tile_ExG, start_threshold, th_crops, out)
+            #conversion en noir et blanc
+            out[out<=200] = 0
+
+    for _mask in outputs:
+        outputs[_mask].flush()
+
+    if (path_temporary_npy != None):
+        del source
+        os.remove(path_temporary_npy)
+
+    return paths
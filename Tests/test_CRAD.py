@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the vote on the crops rows angle of the images of a flight
+(CRAD.Vote_Best_Angle).
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+path_tests = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(path_tests, "..", "Utility"))
+sys.path.insert(0, os.path.join(path_tests, "..", "Crops_Rows_Angle_Detection"))
+_cwd = os.getcwd()
+os.chdir(os.path.join(path_tests, "..", "Crops_Rows_Angle_Detection"))
+import CRAD
+os.chdir(_cwd)
+
+
+@pytest.mark.parametrize("resolution", [0.1, 0.5])
+def test_grid_angles_vote_for_their_own_bin(resolution):
+    nb_bins = int(round(180/resolution))
+    grid = np.round(np.arange(nb_bins)*resolution, 6)
+    for _b, _a in enumerate(grid):
+        best_angle, votes, _ = CRAD.Vote_Best_Angle([_a], resolution)
+        assert votes[_b] == 1
+        assert best_angle == pytest.approx(_a)
+
+
+def test_vote_on_bin_edge():
+    assert CRAD.Vote_Best_Angle([37.3, 37.3, 37.2], 0.1)[0] == 37.3
+    assert CRAD.Vote_Best_Angle([156.7, 156.7, 156.6], 0.1)[0] == 156.7
+    assert CRAD.Vote_Best_Angle([12.5, 12.5, 12.4], 0.5)[0] == 12.5
+
+
+def test_integer_vote_tie_goes_to_largest_angle():
+    assert CRAD.Vote_Best_Angle([10, 10, 20, 20])[0] == 20
+    assert CRAD.Vote_Best_Angle([20.4, 10.2, 20.6, 10.8])[0] == 20.5
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the batch search of the periodic peaks
+(FrequencyAnalysis.Search_Periodic_Peaks_Batch) with the former search, one
+histogram at a time.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+path_tests = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(path_tests, "..", "Utility"))
+sys.path.insert(0, os.path.join(path_tests, "..", "Fourier"))
+_cwd = os.getcwd()
+os.chdir(os.path.join(path_tests, "..", "Fourier"))
+import FrequencyAnalysis as FA
+os.chdir(_cwd)
+
+
+def Search_Periodic_Peaks_Loop(_histogram, _period, _bin_div):
+    """Former search of the peaks of one histogram."""
+    def Get_Corrected_Peak_Index(_histogram, _peak_index, _search_window_half_width):
+        subset_low_boundary = min(max(_peak_index-_search_window_half_width, 0),
+                                  _histogram.size-1)
+        subset_high_boundary = min(max(_peak_index+_search_window_half_width+1, 0),
+                                   _histogram.size-1)
+        subset = _histogram[subset_low_boundary:subset_high_boundary]
+        return np.argsort(subset)[-1] - _search_window_half_width
+    
+    signal_max_index = np.argsort(_histogram)[-1]
+    search_window_half_width = max(int(0.1*_period), 1)
+    
+    first_part_rows=[]
+    peak_index = signal_max_index
+    while (peak_index > 0):
+        corrected_peak_index = peak_index + Get_Corrected_Peak_Index(_histogram,
+                                                                     peak_index,
+                                                                     search_window_half_width)
+        if (_histogram[corrected_peak_index] > 0):
+            first_part_rows += [corrected_peak_index*_bin_div]
+        peak_index = corrected_peak_index - _period
+    
+    second_part_rows=[]
+    peak_index = signal_max_index
+    while (peak_index < _histogram.size):
+        corrected_peak_index = peak_index + Get_Corrected_Peak_Index(_histogram,
+                                                                     peak_index,
+                                                                     search_window_half_width)
+        if (_histogram[corrected_peak_index] > 0):
+            second_part_rows += [corrected_peak_index*_bin_div]
+        peak_index = corrected_peak_index + _period
+    
+    return first_part_rows[::-1]+second_part_rows[1:]
+
+
+def periodic_histogram(_rng, _nb_bins, _period):
+    """
+    Histogram without ties: a random background, a global maximum in the
+    first period and then one peak per period, shifted by up to the half
+    width of the search window (and often exactly by it) from its expected
+    position. A higher decoy lies just outside of every search window, inside
+    the wider windows of the histograms with a longer period. The windows of
+    the search never reach the first or the last bin.
+    """
+    half_width = max(int(0.1*_period), 1)
+    while (True):
+        nb_peaks = (_nb_bins - half_width)//_period - 1
+        shifts = _rng.choice([-half_width, 0, half_width], nb_peaks)
+        first_peak = _nb_bins - _period - nb_peaks*_period - shifts.sum()
+        if (half_width <= first_peak <= _period):
+            break
+    
+    histogram = _rng.random(_nb_bins)
+    histogram[first_peak] = 100
+    peak = first_peak
+    for _s in shifts:
+        expected = peak + _period
+        peak = expected + _s
+        decoy = expected + (half_width+1)*(-1 if _s > 0 else 1)
+        histogram[decoy] = 50 + _rng.random()
+        histogram[peak] = 10 + _rng.random()
+    return histogram
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_batch_search_matches_loop(seed):
+    rng = np.random.default_rng(seed)
+    nb_bins = 400
+    periods = np.array([7, 10, 23, 31])
+    histograms = np.array([periodic_histogram(rng, nb_bins, _p) for _p in periods])
+    
+    batch_peaks = FA.Search_Periodic_Peaks_Batch(histograms, periods, 4)
+    
+    for _h, _p, _peaks in zip(histograms, periods, batch_peaks):
+        assert _peaks == Search_Periodic_Peaks_Loop(_h, _p, 4)
+        assert FA.Search_Periodic_Peaks(_h, _p, 4) == _peaks
+
+
+def test_global_maximum_tie_goes_to_last_bin():
+    #the walk starts from bin 33, the last of the two maxima: starting from
+    #bin 10 would give [10, 21]
+    histogram = np.zeros(40)
+    histogram[[10, 21, 33]] = [3, 1, 3]
+    assert FA.Search_Periodic_Peaks(histogram, 10, 1) == [33]
+    assert FA.Search_Periodic_Peaks_Batch(histogram, 10, 1)[0] == [33]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the run-length engine of the BSAS (run_length_BSAS) with the
+reference implementation BSAS_Process.line_BSAS2 / col_BSAS2 on random masks.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+path_tests = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(path_tests, "..", "Utility"))
+sys.path.insert(0, os.path.join(path_tests, "..", "BSAS"))
+_cwd = os.getcwd()
+os.chdir(os.path.join(path_tests, "..", "BSAS"))
+import bsas
+os.chdir(_cwd)
+
+
+def reference_centroids(_mask, _threshold, _direction):
+    BSAS = bsas.BSAS_Process(None, "test", None, _img_array = _mask)
+    BSAS.set_BSAS_parameters(_threshold)
+    centroids = []
+    if (_direction == 0):
+        for _l in range(_mask.shape[0]):
+            centroids += BSAS.line_BSAS2(_l)
+    else:
+        for _c in range(_mask.shape[1]):
+            centroids += BSAS.col_BSAS2(_c)
+    return np.array(centroids, dtype=np.int64).reshape(-1, 2)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("threshold", range(-1, 7))
+@pytest.mark.parametrize("direction", [0, 1])
+def test_run_length_BSAS_matches_reference(seed, threshold, direction):
+    rng = np.random.default_rng(seed)
+    density = rng.uniform(0.2, 0.8)
+    mask = np.where(rng.random((30, 45)) < density, 255, 0).astype(np.uint8)
+    
+    if (direction == 0):
+        centroids = bsas.run_length_BSAS(mask, threshold)
+    else:
+        centroids = bsas.run_length_BSAS(np.transpose(mask), threshold)[:, ::-1]
+    
+    np.testing.assert_array_equal(centroids,
+                                  reference_centroids(mask, threshold, direction))
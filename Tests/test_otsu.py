@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Compare la version vectorisée de l'algorithme d'Otsu (otsu_threshold,
+segmentation_img) à la version d'origine (Hist, threshold,
+get_optimal_threshold et la double boucle de segmentation) sur des images
+aléatoires.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "Segmentation_Otsu"))
+import otsu as o
+
+
+def segmentation_img_loop(img, th_black, th_crops):
+    """Segmentation d'origine, pixel par pixel."""
+    row, col = img.shape
+    y = np.zeros((row, col))
+    for i in range(0,row):
+        for j in range(0,col):
+            if img[i,j]>th_black:
+                if img[i,j] >= th_crops:
+                    y[i,j] = 255
+                else:
+                    y[i,j] = 150
+            else:
+                y[i,j] = 0
+    return y
+
+
+def random_ExG(seed, shape=(40, 50)):
+    """
+    Image ExG aléatoire en int16: un sol autour de 0 (avec des valeurs
+    négatives) et deux populations de plantes plus claires.
+    """
+    rng = np.random.default_rng(seed)
+    img = rng.normal(0, 15, shape)
+    mask = rng.random(shape)
+    img[mask > 0.7] = rng.normal(90, 20, np.count_nonzero(mask > 0.7))
+    img[mask > 0.9] = rng.normal(180, 25, np.count_nonzero(mask > 0.9))
+    return np.clip(np.rint(img), -255, 255).astype(np.int16)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("th_black", [0, 10, 38, 60])
+def test_otsu_threshold_matches_loops(seed, th_black):
+    img = random_ExG(seed)
+    assert img.min() < 0
+
+    h = o.Hist(img, th_black)
+    expected = o.get_optimal_threshold(o.threshold(h, th_black))
+
+    np.testing.assert_array_equal(o.Hist_np(img, th_black), h)
+    assert o.otsu_threshold(img, th_black) == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("th_black", [-20, 0, 38, 60])
+def test_segmentation_img_matches_loops(seed, th_black):
+    img = random_ExG(seed)
+    th_crops = 120
+
+    res = o.segmentation_img(img, th_black, th_crops)
+
+    assert res.dtype == np.uint8
+    np.testing.assert_array_equal(res,
+                                  segmentation_img_loop(img, th_black, th_crops))
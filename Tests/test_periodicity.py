@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the periods found with the real FFT (periodicity.signal_periods and
+FrequencyAnalysis.Analysis_Context.signal_periods_Y) with the former complex
+FFT and search of the highest rise of the power.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+path_tests = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(path_tests, "..", "Utility"))
+sys.path.insert(0, os.path.join(path_tests, "..", "Fourier"))
+_cwd = os.getcwd()
+os.chdir(os.path.join(path_tests, "..", "Fourier"))
+import periodicity
+import FrequencyAnalysis as FA
+os.chdir(_cwd)
+
+
+def Compute_Power_and_Freq(_signal):
+    fourier = np.fft.fft(_signal)
+    power = np.absolute(fourier/_signal.size)**2
+    freq = np.fft.fftfreq(_signal.size, d=1)
+    return power, freq
+
+def Get_Signal_Freq_Index(_power, _all_freq):
+    """
+    Former Get_Signal_Freq, returning the index of the frequency and the
+    index of the highest rise of the power before its correction.
+    """
+    nb_points = _all_freq.size
+    i=0
+    _max=0
+    _freq_index=0
+    while _all_freq[i] >= 0 and i < nb_points-1:
+        if (_power[i+1] > _power[i]):
+            if (_power[i+1] > _max):
+                _max = _power[i+1]
+                _freq_index = i+1
+        i+=1
+    highest_rise_index = _freq_index
+    if (_freq_index == 0):
+        _freq_index += 1
+    elif(_all_freq[_freq_index] < 0):
+        _freq_index=1
+    return _freq_index, highest_rise_index
+
+def former_period(_signal):
+    power, freq = Compute_Power_and_Freq(_signal)
+    freq_index, highest_rise_index = Get_Signal_Freq_Index(power, freq)
+    return int(1/freq[freq_index]), highest_rise_index
+
+
+def periodic_signals(_rng, _nb_signals, _size):
+    """Noisy histograms of plants spaced by a random period."""
+    signals = _rng.poisson(1, (_nb_signals, _size))
+    for _s in signals:
+        period = _rng.integers(3, max(4, _size//3))
+        _s[_rng.integers(0, period)::period] += _rng.integers(3, 8)
+    return signals
+
+
+@pytest.mark.parametrize("size", [3, 4, 17, 50, 101, 128])
+def test_signal_periods_match_former_fft(size):
+    rng = np.random.default_rng(size)
+    signals = periodic_signals(rng, 30, size)
+    
+    periods = periodicity.signal_periods(signals)
+    for _s, _p in zip(signals, periods):
+        expected, highest_rise_index = former_period(_s)
+        if (size % 2 == 1 and highest_rise_index >= (size-1)//2):
+            #peak on the last frequency of an odd size: the former result
+            #depended on the rounding of its negative mirror
+            continue
+        assert _p == expected
+        assert periodicity.signal_periods(_s) == expected
+
+
+@pytest.mark.parametrize("size", [8, 20, 64])
+def test_nyquist_peak_gives_lowest_frequency(size):
+    signal = np.tile([5, 0], size//2)
+    signal[0] += 1
+    assert former_period(signal)[0] == size
+    assert periodicity.signal_periods(signal) == size
+
+
+@pytest.mark.parametrize("signal", [np.full(12, 3), np.r_[7, np.zeros(12)]])
+def test_no_rise_gives_lowest_frequency(signal):
+    assert former_period(signal)[0] == signal.size
+    assert periodicity.signal_periods(signal) == signal.size
+    assert list(periodicity.signal_periods(np.array([signal, signal]))) == [signal.size]*2
+
+
+def test_signal_periods_Y_match_former_fft():
+    rng = np.random.default_rng(0)
+    lines, bin_div_Y = 400, 4
+    context = FA.Analysis_Context(lines, 300, 2, bin_div_Y)
+    Y_list = []
+    for _r in range(12):
+        period = rng.integers(12, 60)
+        Y = np.arange(rng.integers(0, period), lines, period)
+        Y_list.append(np.clip(Y + rng.integers(-2, 3, Y.size), 0, lines))
+    
+    histograms, periods = context.signal_periods_Y(Y_list)
+    for _Y, _h, _p in zip(Y_list, histograms, periods):
+        histogram = np.histogram(_Y, bins=int(lines/bin_div_Y), range=(0, lines))[0]
+        np.testing.assert_array_equal(_h, histogram)
+        assert _p == former_period(histogram)[0]
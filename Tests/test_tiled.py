@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Compare les masques de la segmentation par tuiles (tiled.Tiled_Segmentation)
+à ceux de data.Data sur une petite image découpée en plusieurs tuiles.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+path_tests = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(path_tests, "..", "Utility"))
+sys.path.insert(0, os.path.join(path_tests, "..", "Segmentation_Otsu"))
+_cwd = os.getcwd()
+import data
+import tiled
+os.chdir(_cwd)
+
+
+def field_image(seed=0, shape=(150, 170)):
+    """Sol bruité et rangs de plantes vertes."""
+    rng = np.random.default_rng(seed)
+    img = (np.array([110, 80, 60]) + rng.integers(0, 25, shape + (3,))).astype(np.uint8)
+    for x0 in range(10, shape[1], 30):
+        for y0 in range(5, shape[0], 17):
+            x = x0 + rng.integers(-2, 3)
+            img[y0:y0+7, x:x+7] = (40, 150 + rng.integers(0, 40), 40)
+    return img
+
+
+@pytest.mark.parametrize("extension", [".png", ".tif", ".npy"])
+@pytest.mark.parametrize("tile_size, overlap", [(64, 0), (48, 8)])
+def test_tiled_masks_match_data(tmp_path, extension, tile_size, overlap):
+    img = field_image()
+    path_source = str(tmp_path / ("field"+extension))
+    if (extension == ".npy"):
+        np.save(path_source, img)
+    else:
+        Image.fromarray(img).save(path_source)
+    Image.fromarray(img).save(str(tmp_path / "field_ref.png"))
+
+    reference = data.Data("field_ref.png", str(tmp_path))
+    reference.create_maskOtsu(10)
+    reference.create_maskHSV(20)
+
+    paths = tiled.Tiled_Segmentation(path_source, str(tmp_path), "field",
+                                     tile_size=tile_size, overlap=overlap)
+
+    np.testing.assert_array_equal(np.load(paths["ExG"]), reference.mask_ExG)
+    np.testing.assert_array_equal(np.load(paths["HSV"]), reference.mask_HSV)
+    np.testing.assert_array_equal(np.load(paths["Otsu"]), reference.mask_Otsu)
+    #la copie .npy temporaire de la source est supprimée
+    assert not os.path.exists(str(tmp_path / "field_source_tmp.npy"))
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L"])
+def test_convert_to_npy_by_bands(tmp_path, mode):
+    img = Image.fromarray(field_image()).convert(mode)
+    path_source = str(tmp_path / "field.tif")
+    img.save(path_source)
+
+    windows = tiled.decoding_windows(tiled.open_image(path_source), 32)
+    assert len(windows) > 1
+
+    source = tiled.Convert_To_Npy(path_source, str(tmp_path / "field.npy"), 32)
+    np.testing.assert_array_equal(source, np.asarray(img.convert("RGB")))
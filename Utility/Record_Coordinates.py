@@ -23,6 +23,7 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
 import general_IO as gIO
+import mask_IO
 
 
 # =============================================================================
@@ -58,10 +59,13 @@ unity_date = "images_niort_decoupees"
     
 path_input_root = ""
 path_input_raw = ""
-names_input_raw = os.listdir(path_input_raw)
+#sorted by name like the masks, so that the raw image and the Otsu mask of
+#an index match
+names_input_raw = sorted(os.listdir(path_input_raw),
+                         key = lambda _name: _name.split('.')[0])
 
 path_input_OTSU = ""
-names_input_OTSU = os.listdir(path_input_OTSU)
+names_input_OTSU = mask_IO.list_masks(path_input_OTSU)
 
 
 path_output_position_files = ""
@@ -78,7 +82,7 @@ data_input_raw = import_data(path_input_raw,
                              get_img_array)
 data_input_OTSU = import_data(path_input_OTSU,
                               names_input_OTSU[:subset_size],
-                              get_img_array)
+                              mask_IO.load_mask_file)
 
 print("done")
 
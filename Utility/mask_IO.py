@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Input/Output functions for the binary masks (Otsu, rotated Otsu, ...) passed
+between the pre-treatment, the Fourier analysis and the Multi Agent System.
+
+The masks are stored losslessly so that the next stages can use them directly
+as 0/255 uint8 arrays:
+    - "NPY": uint8 numpy array, memory-mappable (default)
+    - "PNG": 8 bits grayscale image
+    - "JPEG": lossy, only meant as a preview. For backward compatibility with
+    the masks saved by the older versions, a JPEG mask is still read and
+    re-thresholded at 200 on its first channel.
+
+A rotated mask can also be stored without its raster, as a ".rot" file (see
+save_rotated_mask): a small JSON file giving the original mask and the angle
+of the rotation. It is loaded as a rotated_frame.Rotated_Mask.
+"""
+
+import os
+import json
+import numpy as np
+from PIL import Image
+
+import rotated_frame
+
+MASK_EXTENSIONS = {"NPY": ".npy", "PNG": ".png", "JPEG": ".jpg"}
+
+ROTATED_MASK_EXTENSION = ".rot"
+
+#order of preference when several files exist for the same mask
+LOSSLESS_FIRST = [".npy", ".png", ROTATED_MASK_EXTENSION, ".jpg", ".jpeg"]
+
+
+def save_mask(_path, _file_name, _mask, _format = "NPY"):
+    """
+    _path (string):
+        directory where the mask is saved
+
+    _file_name (string):
+        name of the mask file. Its extension, if any, is replaced by the one
+        of _format.
+
+    _mask (numpy.array):
+        2D 0/255 mask
+
+    _format (string):
+        one of "NPY", "PNG" or "JPEG"
+
+    Returns the path of the written file
+    """
+    file_path = os.path.join(_path,
+                             os.path.splitext(_file_name)[0]+MASK_EXTENSIONS[_format])
+    _mask = np.asarray(_mask, dtype=np.uint8)
+
+    if (_format == "NPY"):
+        np.save(file_path, _mask)
+    elif (_format == "PNG"):
+        Image.fromarray(_mask).save(file_path, "PNG")
+    else:
+        Image.fromarray(_mask).convert("RGB").save(file_path, "JPEG")
+
+    return file_path
+
+def save_rotated_mask(_path, _file_name, _source_file_path, _angle):
+    """
+    Saves the mask _source_file_path rotated by _angle degrees (counter clock
+    wise, with expansion as PIL's Image.rotate) without rendering it: the
+    .rot file only records the path of the source mask, relatively to _path,
+    and the angle.
+
+    Returns the path of the written file
+    """
+    file_path = os.path.join(_path, os.path.splitext(_file_name)[0]+ROTATED_MASK_EXTENSION)
+    with open(file_path, "w") as rot_file:
+        json.dump({"source": os.path.relpath(_source_file_path, _path),
+                   "angle": _angle}, rot_file)
+
+    return file_path
+
+def find_mask_file(_path, _file_name):
+    """
+    Returns the path of the mask file _file_name in _path. If _file_name has
+    no extension, the lossless formats are looked for first.
+    """
+    file_path = os.path.join(_path, _file_name)
+    if (os.path.splitext(_file_name)[1].lower() in LOSSLESS_FIRST):
+        return file_path
+
+    for _ext in LOSSLESS_FIRST:
+        if (os.path.exists(file_path+_ext)):
+            return file_path+_ext
+
+    raise FileNotFoundError("No mask file found for {0}".format(file_path))
+
+def load_mask(_path, _file_name, _mmap = True):
+    """
+    Loads the mask _file_name from _path as a 2D 0/255 uint8 array (or as a
+    rotated_frame.Rotated_Mask for a .rot file).
+
+    _mmap (bool):
+        If True, a NPY mask is memory-mapped (read-only) instead of being
+        read in memory.
+    """
+    file_path = find_mask_file(_path, _file_name)
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if (ext == ".npy"):
+        return np.load(file_path, mmap_mode = "r" if _mmap else None)
+
+    if (ext == ROTATED_MASK_EXTENSION):
+        with open(file_path, "r") as rot_file:
+            rotation = json.load(rot_file)
+        source_path = os.path.join(os.path.dirname(file_path), rotation["source"])
+        return rotated_frame.Rotated_Mask(load_mask_file(source_path, _mmap),
+                                          rotation["angle"])
+
+    mask = np.array(Image.open(file_path))
+    if (mask.ndim == 3):
+        mask = mask[:,:,0]
+
+    if (ext == ".png"):
+        return mask
+
+    #JPEG artifacts: the pixels are not exactly 0 or 255
+    return np.where(mask > 200, 255, 0).astype(np.uint8)
+
+def load_mask_file(_path_mask_file, _mmap = True):
+    """
+    Same as load_mask but with the full path of the file. Meant to be used
+    as the _import_function of the import_data functions.
+    """
+    _path, _file_name = os.path.split(_path_mask_file)
+    return load_mask(_path, _file_name, _mmap)
+
+def list_masks(_path):
+    """
+    Lists the mask files of _path, sorted by name. When the same mask exists
+    in several formats (for example a NPY mask and its JPEG preview), only the
+    lossless file is kept.
+    """
+    selected = {}
+    for _name in os.listdir(_path):
+        _id, _ext = os.path.splitext(_name)
+        _ext = _ext.lower()
+        if (_ext in LOSSLESS_FIRST):
+            if (not _id in selected or
+                LOSSLESS_FIRST.index(_ext) < LOSSLESS_FIRST.index(os.path.splitext(selected[_id])[1].lower())):
+                selected[_id] = _name
+
+    return [selected[_id] for _id in sorted(selected)]
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Rotated frame of a binary mask, without rendering the rotated image.
+
+The crops rows angle detection rotates the Otsu mask so that the rows are
+vertical. Instead of rendering, saving and reading back the rotated raster,
+a Rotated_Mask gives access to the pixels of the rotated mask by mapping its
+coordinates back to the original mask. Only the requested pixels are read.
+
+The geometry (size of the rotated image, pixel centers and nearest neighbour
+sampling) is the one of PIL's Image.rotate(angle, expand=True) with the
+default NEAREST filter: a Rotated_Mask and the rotated PIL image are equal
+pixel by pixel.
+"""
+
+import math
+import numpy as np
+from PIL import Image
+
+
+def rotation_geometry(_width, _height, _angle):
+    """
+    Size of the image _width x _height rotated counter clockwise by _angle
+    degrees (with expansion) and the affine matrix (a, b, c, d, e, f) mapping
+    the coordinates (x, y) of the rotated image to the coordinates
+    (a*x + b*y + c, d*x + e*y + f) of the original image, as computed by
+    PIL's Image.rotate.
+
+    Returns (new_width, new_height, matrix)
+    """
+    theta = -math.radians(_angle % 360.0)
+    matrix = [round(math.cos(theta), 15), round(math.sin(theta), 15), 0.0,
+              round(-math.sin(theta), 15), round(math.cos(theta), 15), 0.0]
+
+    def transform(x, y):
+        (a, b, c, d, e, f) = matrix
+        return a*x + b*y + c, d*x + e*y + f
+
+    center = (_width/2, _height/2)
+    matrix[2], matrix[5] = transform(-center[0], -center[1])
+    matrix[2] += center[0]
+    matrix[5] += center[1]
+
+    corners = [transform(x, y) for x, y in ((0, 0), (_width, 0),
+                                            (_width, _height), (0, _height))]
+    new_width = math.ceil(max([_c[0] for _c in corners])) - \
+                math.floor(min([_c[0] for _c in corners]))
+    new_height = math.ceil(max([_c[1] for _c in corners])) - \
+                 math.floor(min([_c[1] for _c in corners]))
+    matrix[2], matrix[5] = transform(-(new_width - _width)/2.0,
+                                     -(new_height - _height)/2.0)
+
+    return new_width, new_height, matrix
+
+def _fixed(_value):
+    """
+    16.16 fixed point representation used by PIL for the affine transforms
+    """
+    return math.floor(_value*65536.0 + 0.5)
+
+
+class Rotated_Mask:
+    """
+    Read-only 2D array like view of the mask _mask rotated by _angle degrees.
+
+    It supports .shape, indexing with two integers, two slices or two
+    broadcastable integer arrays (same semantic as numpy), np.asarray (which
+    renders the whole rotated mask) and iteration over blocks of lines or
+    columns with iter_blocks.
+    """
+    ndim = 2
+
+    def __init__(self, _mask, _angle):
+        self.mask = _mask
+        self.angle = _angle % 360.0
+        self.dtype = np.asarray(_mask[:0, :0]).dtype
+
+        height, width = _mask.shape[:2]
+        if (self.angle in (0, 180)):
+            self.shape = (height, width)
+        elif (self.angle in (90, 270)):
+            self.shape = (width, height)
+        else:
+            new_width, new_height, matrix = rotation_geometry(width, height, self.angle)
+            self.shape = (new_height, new_width)
+            #coordinates of the center of the pixel (0, 0) and steps, in fixed point
+            self.fixed_matrix = (_fixed(matrix[0]), _fixed(matrix[1]),
+                                 _fixed(matrix[2] + matrix[0]*0.5 + matrix[1]*0.5),
+                                 _fixed(matrix[3]), _fixed(matrix[4]),
+                                 _fixed(matrix[5] + matrix[3]*0.5 + matrix[4]*0.5))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def source_coordinates(self, _lines, _columns):
+        """
+        Coordinates (lines, columns) in the original mask of the pixels
+        (_lines, _columns) of the rotated mask. The pixels falling outside of
+        the original mask get the coordinates -1.
+        """
+        lines = np.asarray(_lines, dtype=np.int64)
+        columns = np.asarray(_columns, dtype=np.int64)
+        height, width = self.mask.shape[:2]
+
+        if (self.angle == 0):
+            source_lines, source_columns = lines, columns
+        elif (self.angle == 90):
+            source_lines, source_columns = columns, width - 1 - lines
+        elif (self.angle == 180):
+            source_lines, source_columns = height - 1 - lines, width - 1 - columns
+        elif (self.angle == 270):
+            source_lines, source_columns = height - 1 - columns, lines
+        else:
+            (a0, a1, a2, a3, a4, a5) = self.fixed_matrix
+            source_columns = (a2 + columns*a0 + lines*a1) >> 16
+            source_lines = (a5 + columns*a3 + lines*a4) >> 16
+
+        source_lines, source_columns = np.broadcast_arrays(source_lines, source_columns)
+        outside = (source_lines < 0) | (source_lines >= height) | \
+                  (source_columns < 0) | (source_columns >= width)
+        return np.where(outside, -1, source_lines), np.where(outside, -1, source_columns)
+
+    def source_pixel(self, _line, _column):
+        """
+        Same as source_coordinates for a single pixel, in pure python: the
+        agents of the Multi Agent System read the mask pixel by pixel.
+        """
+        height, width = self.mask.shape[:2]
+        if (self.angle == 0):
+            line, column = _line, _column
+        elif (self.angle == 90):
+            line, column = _column, width - 1 - _line
+        elif (self.angle == 180):
+            line, column = height - 1 - _line, width - 1 - _column
+        elif (self.angle == 270):
+            line, column = height - 1 - _column, _line
+        else:
+            (a0, a1, a2, a3, a4, a5) = self.fixed_matrix
+            column = (a2 + _column*a0 + _line*a1) >> 16
+            line = (a5 + _column*a3 + _line*a4) >> 16
+
+        if (line < 0 or line >= height or column < 0 or column >= width):
+            return -1, -1
+        return line, column
+
+    def sample(self, _lines, _columns):
+        """
+        Values of the pixels (_lines, _columns) of the rotated mask. The
+        pixels outside of the original mask are black.
+        """
+        source_lines, source_columns = self.source_coordinates(_lines, _columns)
+        inside = source_lines >= 0
+        values = np.zeros(source_lines.shape, dtype=self.dtype)
+        values[inside] = self.mask[source_lines[inside], source_columns[inside]]
+        return values
+
+    def __getitem__(self, _key):
+        if (not isinstance(_key, tuple)):
+            _key = (_key, slice(None))
+        lines, columns = _key
+
+        if (isinstance(lines, (int, np.integer)) and isinstance(columns, (int, np.integer))):
+            line = int(lines) + self.shape[0] if lines < 0 else int(lines)
+            column = int(columns) + self.shape[1] if columns < 0 else int(columns)
+            if (line < 0 or line >= self.shape[0] or column < 0 or column >= self.shape[1]):
+                raise IndexError("index out of bounds for a rotated mask of shape {0}".format(self.shape))
+            line, column = self.source_pixel(line, column)
+            if (line < 0):
+                return self.dtype.type(0)
+            return self.mask[line, column]
+
+        if (isinstance(lines, slice) or isinstance(columns, slice)):
+            #outer indexing, integers remove their dimension
+            lines_index = np.arange(self.shape[0])[lines]
+            columns_index = np.arange(self.shape[1])[columns]
+            values = self.sample(np.reshape(lines_index, (-1, 1)),
+                                 np.reshape(columns_index, (1, -1)))
+            return values.reshape(np.shape(lines_index) + np.shape(columns_index))
+
+        lines = np.asarray(lines)
+        columns = np.asarray(columns)
+        #negative indices are counted from the end as in numpy
+        lines = np.where(lines < 0, lines + self.shape[0], lines)
+        columns = np.where(columns < 0, columns + self.shape[1], columns)
+        if (np.any((lines < 0) | (lines >= self.shape[0]) |
+                   (columns < 0) | (columns >= self.shape[1]))):
+            raise IndexError("index out of bounds for a rotated mask of shape {0}".format(self.shape))
+
+        values = self.sample(lines, columns)
+        if (values.ndim == 0):
+            return values[()]
+        return values
+
+    def __array__(self, dtype = None, copy = None):
+        values = self[:, :]
+        if (dtype != None):
+            values = values.astype(dtype)
+        return values
+
+    def iter_blocks(self, _axis = 0, _block_size = 256):
+        """
+        Renders the rotated mask by blocks of _block_size lines (_axis = 0) or
+        columns (_axis = 1). Yields (start, block) where block holds the lines
+        (or the columns) start to start + _block_size of the rotated mask.
+        """
+        for _start in range (0, self.shape[_axis], _block_size):
+            _stop = min(_start + _block_size, self.shape[_axis])
+            if (_axis == 0):
+                yield _start, self[_start:_stop, :]
+            else:
+                yield _start, self[:, _start:_stop]
+
+    def to_image(self):
+        """
+        Renders the rotated mask as a PIL image, for the previews
+        """
+        return Image.fromarray(np.asarray(self))
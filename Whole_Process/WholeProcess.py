@@ -20,23 +20,32 @@ def CompleteProcess(_path_input_rgb_img, _path_output_root,
                     _make_unique_folder_per_session=False, _session=1,
                     _do_Otsu=True, _do_AD=True,
                     _save_AD_score_images=False, _save_BSAS_images=False,
-                    _bsas_threshold=1,
+                    _bsas_threshold=1, _keep_centroids=False,
                     
                     _bin_div_X=2, _bin_div_Y=4,
                     
                     _RAs_group_size=20, _RAs_group_steps=2, _Simulation_steps=50,
                     _RALs_fuse_factor=0.5, _RALs_fill_factor=1.5):
+    """
+    _keep_centroids (bool):
+        If True (and _do_AD), the BSAS centroids of every image are kept in
+        memory and given directly to the Fourier Analysis instead of being read
+        again from the bsas files. It saves the reading of the files but the
+        memory used then grows with the number of images of the flight.
+    """
     
-    PiFT.All_Pre_Treatment(_path_input_rgb_img,
+    centroids = PiFT.All_Pre_Treatment(_path_input_rgb_img,
                       _path_output_root,
                       _make_unique_folder_per_session, _session,
                       _do_Otsu, _do_AD,
                       _save_AD_score_images, _save_BSAS_images,
-                      _bsas_threshold)
+                      _bsas_threshold,
+                      _return_centroids = _do_AD and _keep_centroids)
     
     FA.All_Fourier_Analysis(_path_output_root,
                          _session,
-                         _bin_div_X, _bin_div_Y)
+                         _bin_div_X, _bin_div_Y,
+                         centroids)
     
     
     MIS.All_Simulations(_path_input_rgb_img,
@@ -52,7 +61,7 @@ if (__name__=="__main__"):
                     _make_unique_folder_per_session=False, _session=1,
                     _do_Otsu=True, _do_AD=True,
                     _save_AD_score_images=False, _save_BSAS_images=False,
-                    _bsas_threshold=1,
+                    _bsas_threshold=1, _keep_centroids=False,
                     
                     _bin_div_X=2, _bin_div_Y=4,
                     